@@ -1 +1,2 @@
 from .transient_scripts import Evaluation
+from .transient_library import StructureLibrary
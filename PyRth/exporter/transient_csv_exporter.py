@@ -189,6 +189,20 @@ class CSVExporter(BaseExporter):
                 module.cau_res,
             )
 
+        if module.struc_resample_points is not None:
+            self.save_csv(
+                module.save_cumul_struc,
+                self.construct_filename(module, "resampled_cumul_struc"),
+                module.resampled_int_cau_res,
+                module.resampled_int_cau_cap,
+            )
+            self.save_csv(
+                module.save_diff_struc,
+                self.construct_filename(module, "resampled_diff_struc"),
+                module.resampled_int_cau_res,
+                module.resampled_diff_struc,
+            )
+
     def theo_structure_function_data_handler(self, module):
         logger.debug("theo_structure_function_data_handler called")
 
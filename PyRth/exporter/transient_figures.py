@@ -304,7 +304,7 @@ class LocalGradientFigure(StructureFigure):
 
         self.ax.semilogx(
             module.int_cau_cap,
-            module.cau_res / module.cau_cap,
+            module.local_gradient,
             color=self.next_color(),
             label="local_grad." + module.label,
             marker="o",
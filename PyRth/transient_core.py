@@ -1,3 +1,4 @@
+import functools
 import gmpy2 as gp
 from gmpy2 import mpfr
 import numpy as np
@@ -19,6 +20,40 @@ from . import transient_engine as eng
 
 logger = logging.getLogger("PyRthLogger")
 
+MPFR_STRUC_METHODS = ["polylong", "khatwani", "sobhy", "boor_golub"]
+STRUC_METHODS = MPFR_STRUC_METHODS + ["lanczos", "rkpw"]
+STRUC_RESULT_KEYS = [
+    "cau_res",
+    "cau_cap",
+    "int_cau_res",
+    "int_cau_cap",
+    "diff_struc",
+    "local_gradient",
+    "resampled_int_cau_res",
+    "resampled_int_cau_cap",
+    "resampled_diff_struc",
+]
+
+MPFR_INTERMEDIATE_KEYS = [
+    "mpfr_resist_fost",
+    "mpfr_capa_fost",
+    "mpfr_z_num",
+    "mpfr_z_denom",
+    "cleaned_mpfr_num",
+    "cleaned_mpfr_denom",
+]
+
+
+def mpfr_precision(method):
+    # run the decorated method under a local gmpy2 context with the module's precision,
+    # the global context stays untouched so modules can run side by side in threads
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with gp.context(gp.get_context(), precision=self.precision):
+            return method(self, *args, **kwargs)
+
+    return wrapper
+
 
 # figures and data handling are split in transient_output
 class StructureFunction:
@@ -39,8 +74,6 @@ class StructureFunction:
                 f"Parameter 'precision' must be a positive integer, got {self.precision}"
             )
 
-        gp.get_context().precision = self.precision
-
     def read_t3ster(self, f):
         self.data_header = [np.array(line.strip().split(" ")) for line in f]
         self.data = np.loadtxt(self.infile, delimiter=" ", skiprows=7)
@@ -540,6 +573,41 @@ class StructureFunction:
         self.therm_resist_fost = self.crop_time_spec
         self.therm_capa_fost = np.exp(self.crop_log_time) / self.therm_resist_fost
 
+    def reduce_foster_network(self):
+        # merges adjacent foster poles before the cauer transformation, the step response
+        # of the reduced network deviates at most foster_reduction_tol * R_th from the original
+
+        if self.foster_reduction_tol <= 0.0:
+            raise ValueError(
+                f"Parameter 'foster_reduction_tol' must be positive, got {self.foster_reduction_tol}"
+            )
+
+        org_size = self.therm_resist_fost.size
+        log_tau = np.log(self.therm_resist_fost * self.therm_capa_fost)
+
+        red_res, red_tau = eng.reduce_foster(
+            self.therm_resist_fost,
+            log_tau,
+            self.log_time_pad,
+            self.foster_reduction_tol,
+        )
+
+        time = np.exp(self.log_time_pad)[:, None]
+        org_imp = np.sum(
+            self.therm_resist_fost * (1.0 - np.exp(-time / np.exp(log_tau))), axis=1
+        )
+        red_imp = np.sum(red_res * (1.0 - np.exp(-time / red_tau)), axis=1)
+        self.foster_reduction_error = np.max(np.abs(org_imp - red_imp))
+
+        self.therm_resist_fost = red_res
+        self.therm_capa_fost = red_tau / red_res
+
+        logger.info(
+            f"Foster network reduced from {org_size} to {red_res.size} poles, "
+            f"max. impedance deviation: {self.foster_reduction_error:.3e} K/W"
+        )
+
+    @mpfr_precision
     def mpfr_foster_impedance(self):
         # use gmp2 for arbitrary precision floating point arithmetic
         self.mpfr_resist_fost = [
@@ -553,6 +621,107 @@ class StructureFunction:
             self.mpfr_resist_fost, self.mpfr_capa_fost
         )
 
+    def cauer_transform(self):
+        # the multiprecision methods expect mpfr_foster_impedance() to have run
+
+        if self.struc_method == "polylong":
+            self.poly_long_div()
+        elif self.struc_method in ["khatwani", "sobhy"]:
+            self.j_fraction_methods()
+        elif self.struc_method == "boor_golub":
+            self.boor_golub()
+        elif self.struc_method == "lanczos":
+            self.lanczos()
+        elif self.struc_method == "rkpw":
+            self.rkpw()
+        else:
+            raise ValueError(
+                f"Parameter 'struc_method' must be one of {STRUC_METHODS}, got {self.struc_method}"
+            )
+
+    def struc_post_processing(self):
+        # cumulative, differential and local structure functions from the cauer elements
+
+        self.int_cau_res = np.cumsum(self.cau_res)
+        self.int_cau_cap = np.cumsum(self.cau_cap)
+
+        self.diff_struc = utl.diff_structure_function(
+            self.int_cau_res, self.int_cau_cap
+        )
+        self.local_gradient = utl.local_gradient(self.cau_res, self.cau_cap)
+
+        if self.struc_resample_points is not None:
+            if (
+                not isinstance(self.struc_resample_points, int)
+                or self.struc_resample_points < 2
+            ):
+                raise ValueError(
+                    f"Parameter 'struc_resample_points' must be an integer >= 2, got {self.struc_resample_points}"
+                )
+
+            (
+                self.resampled_int_cau_res,
+                self.resampled_int_cau_cap,
+                self.resampled_diff_struc,
+            ) = utl.resample_structure_function(
+                self.int_cau_res, self.int_cau_cap, self.struc_resample_points
+            )
+
+    def apply_memory_policy(self):
+        # the mpfr lists are only needed during the cauer transformation
+
+        released = 0
+        if not self.keep_mpfr_intermediates:
+            for key in MPFR_INTERMEDIATE_KEYS:
+                if hasattr(self, key):
+                    released += mpu.mpfr_list_nbytes(getattr(self, key))
+                    delattr(self, key)
+
+        self.memory_footprint = self.retained_nbytes()
+
+        logger.info(
+            f"Module '{self.label}' retains {self.memory_footprint / 1e6:.2f} MB, "
+            f"released {released / 1e6:.2f} MB of multiprecision intermediates"
+        )
+
+    def retained_nbytes(self):
+        # approximate size of the arrays and mpfr lists held by the module
+
+        nbytes = 0
+        for value in vars(self).values():
+            if isinstance(value, np.ndarray):
+                nbytes += value.nbytes
+            elif isinstance(value, list) and value and isinstance(value[0], gp.mpfr):
+                nbytes += mpu.mpfr_list_nbytes(value)
+
+        return nbytes
+
+    def struc_limit_reached(self, sum_res, sum_cap):
+        # optional early termination of the cauer expansion at a cumulative resistance or capacity
+
+        if (
+            self.struc_max_resistance is not None
+            and sum_res >= self.struc_max_resistance
+        ):
+            return True
+        if (
+            self.struc_max_capacitance is not None
+            and sum_cap >= self.struc_max_capacitance
+        ):
+            return True
+        return False
+
+    def truncate_cauer_network(self, length, full_length):
+
+        self.cau_res = self.cau_res[:length]
+        self.cau_cap = self.cau_cap[:length]
+
+        logger.info(
+            f"Cauer expansion stopped after {length} of {full_length} stages at "
+            f"R = {np.sum(self.cau_res):.4f} K/W, C = {np.sum(self.cau_cap):.4e} J/K"
+        )
+
+    @mpfr_precision
     def poly_long_div(self):
         # transforms the foster to the cauer thermal equivalent network
 
@@ -561,6 +730,9 @@ class StructureFunction:
         self.cau_res = np.zeros(ar_len)
         self.cau_cap = np.zeros(ar_len)
 
+        sum_res = 0.0
+        sum_cap = 0.0
+
         for i in range(ar_len):
             self.mpfr_z_num, self.mpfr_z_denom, cap, res = mpu.precision_step(
                 self.mpfr_z_num, self.mpfr_z_denom
@@ -568,6 +740,13 @@ class StructureFunction:
             self.cau_res[i] = float(res)
             self.cau_cap[i] = float(cap)
 
+            sum_res += self.cau_res[i]
+            sum_cap += self.cau_cap[i]
+
+            if i < ar_len - 1 and self.struc_limit_reached(sum_res, sum_cap):
+                self.truncate_cauer_network(i + 1, ar_len)
+                break
+
         if np.any(self.cau_res[self.cau_res < 0.0]) or np.any(
             self.cau_res[self.cau_cap < 0.0]
         ):
@@ -576,17 +755,9 @@ class StructureFunction:
                 len(self.cau_cap),
             )
 
-        self.int_cau_res = np.cumsum(self.cau_res)
-        self.int_cau_cap = np.cumsum(self.cau_cap)
-
-        self.diff_struc = np.zeros(ar_len - 1)
-
-        for i in range(len(self.int_cau_res) - 1):
-            if not (self.int_cau_res[i] - self.int_cau_res[i + 1]) == 0.0:
-                self.diff_struc[i] = (self.int_cau_cap[i] - self.int_cau_cap[i + 1]) / (
-                    self.int_cau_res[i] - self.int_cau_res[i + 1]
-                )
+        self.struc_post_processing()
 
+    @mpfr_precision
     def boor_golub(self):
 
         poles = []
@@ -613,56 +784,70 @@ class StructureFunction:
         mu = [mpfr("0.0")] * (M + 1)
         l_mu_sum = [mpfr("0.0")] * (M)
         l_mu_prod = [mpfr("0.0")] * (M)
-        B = [0] * (M + 1)
-
-        B[0] = [mpfr("1.0")]
 
         for i in range(M + 1):
             lmda[0] = lmda[0] - w_0[i] * poles[i]
         lmda[0] = lmda[0] / w_sum
 
         k[2] = mpfr("1.0") / (k[1] * lmda[0])
-        B[1] = [lmda[0], mpfr("1.0")]
 
-        Bs1 = list(B[1])
-        Bs1.insert(0, mpfr("0.0"))
+        # the orthogonal polynomials B[i] are carried as their values at the poles,
+        # the three-term recurrence updates them in O(M) per step instead of
+        # re-evaluating every polynomial by horner at every pole
+        B_prev = [mpfr("1.0")] * (M + 1)
+        B_curr = [pole + lmda[0] for pole in poles]
+
+        norm_prev = mpu.mpfr_weighted_value_product(B_prev, B_prev, w_0)
+        norm_curr = mpu.mpfr_weighted_value_product(B_curr, B_curr, w_0)
 
-        l_mu_prod[0] = mpu.mpfr_weighted_self_product(
-            poles, B[1], w_0
-        ) / mpu.mpfr_weighted_self_product(poles, B[0], w_0)
+        l_mu_prod[0] = norm_curr / norm_prev
 
         mu[1] = l_mu_prod[0] / lmda[0]
 
+        k[3] = (k[1] * lmda[0]) / mu[1]
+
+        # running products of the recursion coefficients, k[2i] and k[2i+1] follow
+        # directly once lmda[i-1] and mu[i] are known
+        lambdas = k[1] * lmda[0]
+        mus = mpfr("1.0")
+
+        sum_res = float(k[2])
+        sum_cap = float(k[1])
+        stages = M + 1
+
         for i in range(2, M + 1):
-            Bs = list(B[i - 1])
-            Bs.insert(0, mpfr("0.0"))
+            if self.struc_limit_reached(sum_res, sum_cap):
+                stages = i - 1
+                break
 
-            l_mu_sum[i - 1] = mpu.mpfr_weighted_inner_product(
-                poles, B[i - 1], Bs, w_0
-            ) / mpu.mpfr_weighted_self_product(poles, B[i - 1], w_0)
+            Bs = [pole * val for pole, val in zip(poles, B_curr)]
+
+            l_mu_sum[i - 1] = (
+                -mpu.mpfr_weighted_value_product(B_curr, Bs, w_0) / norm_curr
+            )
 
             lmda[i - 1] = l_mu_sum[i - 1] - mu[i - 1]
 
-            fst = mpu.mpfr_pol_mul(([l_mu_sum[i - 1], mpfr("1.0")]), B[i - 1])
-            snd = mpu.mpfr_pol_mul(([-l_mu_prod[i - 2]]), B[i - 2])
-            B[i] = mpu.mpfr_pol_add(fst, snd)
+            B_next = [
+                Bs[j] + l_mu_sum[i - 1] * B_curr[j] - l_mu_prod[i - 2] * B_prev[j]
+                for j in range(M + 1)
+            ]
+            B_prev, B_curr = B_curr, B_next
+
+            norm_prev = norm_curr
+            norm_curr = mpu.mpfr_weighted_value_product(B_curr, B_curr, w_0)
 
-            l_mu_prod[i - 1] = mpu.mpfr_weighted_self_product(
-                poles, B[i], w_0
-            ) / mpu.mpfr_weighted_self_product(poles, B[i - 1], w_0)
+            l_mu_prod[i - 1] = norm_curr / norm_prev
             mu[i] = l_mu_prod[i - 1] / lmda[i - 1]
 
-        k[3] = (k[1] * lmda[0]) / mu[1]
-        for i in range(2, M + 1):
-            lambdas = k[1]
-            mus = mu[1]
-            for j in range(2, i):
-                mus = mus * mu[j]
-            for j in range(i):
-                lambdas = lambdas * lmda[j]
+            mus = mus * mu[i - 1]
+            lambdas = lambdas * lmda[i - 1]
             k[2 * i] = mus / lambdas
             k[2 * i + 1] = lambdas / (mus * mu[i])
 
+            sum_res += float(k[2 * i])
+            sum_cap += float(k[2 * i - 1])
+
         self.cau_res = np.zeros(M + 1)
         self.cau_cap = np.zeros(M + 1)
 
@@ -671,6 +856,9 @@ class StructureFunction:
             self.cau_cap[i] = float(k[2 * i + 1])
         self.cau_cap[M] = float(k[2 * M + 1])
 
+        if stages < M + 1:
+            self.truncate_cauer_network(stages, M + 1)
+
         if np.any(self.cau_res[self.cau_res < 0.0]) or np.any(
             self.cau_res[self.cau_cap < 0.0]
         ):
@@ -679,17 +867,9 @@ class StructureFunction:
                 len(self.cau_cap),
             )
 
-        self.int_cau_res = np.cumsum(self.cau_res)
-        self.int_cau_cap = np.cumsum(self.cau_cap)
-
-        self.diff_struc = np.zeros(M)
-
-        for i in range(len(self.int_cau_res) - 1):
-            if not (self.int_cau_res[i] - self.int_cau_res[i + 1]) == 0.0:
-                self.diff_struc[i] = (self.int_cau_cap[i] - self.int_cau_cap[i + 1]) / (
-                    self.int_cau_res[i] - self.int_cau_res[i + 1]
-                )
+        self.struc_post_processing()
 
+    @mpfr_precision
     def j_fraction_methods(self):
         # use gmp2 for arbitrary precision floating point arithmetic
 
@@ -745,64 +925,75 @@ class StructureFunction:
         return markov_parameters
 
     def khatwani_method(self, N, markov_parameters):
-        a_matrix = [[None] * (2 * N) for i in range(N + 1)]
-        a_matrix[0] = [mpfr("0.0")] * (2 * N)
-        a_matrix[0][0] = mpfr("1.0")
+        # every row of the khatwani table only depends on the two rows before it,
+        # so only those are kept alive instead of the full (N+1) x 2N table
 
         large_h = [None] * (N - 1)
         small_h = [None] * (N - 1)
 
-        for i in range(2 * N):
-            a_matrix[1][i] = markov_parameters[i]
+        row_prev = [mpfr("0.0")] * (2 * N)
+        row_prev[0] = mpfr("1.0")
+        row_curr = list(markov_parameters[: 2 * N])
 
-        large_h[0] = a_matrix[0][0] / a_matrix[1][0]
-        small_h[0] = (a_matrix[0][1] - large_h[0] * a_matrix[1][1]) / a_matrix[1][0]
+        large_h[0] = row_prev[0] / row_curr[0]
+        small_h[0] = (row_prev[1] - large_h[0] * row_curr[1]) / row_curr[0]
 
         for i in range(2, N):
-            for j in range(2 * N - (i - 1) * 2):
-                a_matrix[i][j] = (
-                    a_matrix[i - 2][j + 2]
-                    - large_h[i - 2] * a_matrix[i - 1][j + 2]
-                    - small_h[i - 2] * a_matrix[i - 1][j + 1]
-                )
+            row_next = [
+                row_prev[j + 2]
+                - large_h[i - 2] * row_curr[j + 2]
+                - small_h[i - 2] * row_curr[j + 1]
+                for j in range(2 * N - (i - 1) * 2)
+            ]
 
-            large_h[i - 1] = a_matrix[i - 1][0] / a_matrix[i][0]
-            small_h[i - 1] = (
-                a_matrix[i - 1][1] - large_h[i - 1] * a_matrix[i][1]
-            ) / a_matrix[i][0]
+            large_h[i - 1] = row_curr[0] / row_next[0]
+            small_h[i - 1] = (row_curr[1] - large_h[i - 1] * row_next[1]) / row_next[0]
+
+            row_prev, row_curr = row_curr, row_next
 
         return large_h, small_h
 
     def sobhy_method(self, N):
-        A = [[mpfr("0.0")] * (N) for i in range(N + 1)]
-        B = [[mpfr("0.0")] * (N) for i in range(N + 1)]
+        # rolling version of the sobhy tables, row j of A and B only needs row j - 1,
+        # the coefficients are read off the first column as soon as a row is complete
 
-        for i in range(N):
-            A[0][i] = self.cleaned_mpfr_denom[i]
-            B[0][i] = self.cleaned_mpfr_denom[i]
+        a = [None] * (N - 1)
+        b = [None] * (N - 1)
 
+        A_prev = [self.cleaned_mpfr_denom[i] for i in range(N)]
+
+        A_curr = [mpfr("0.0")] * N
         for i in range(N - 1):
-            A[1][i] = self.cleaned_mpfr_num[i + 1]
+            A_curr[i] = self.cleaned_mpfr_num[i + 1]
 
+        B_curr = [mpfr("0.0")] * N
+        ratio = A_prev[0] / A_curr[0]
         for k in range(N - 1):
-            j = 1
-            B[j][k] = A[j - 1][k + 1] - A[j - 1][0] / A[j][0] * A[j][k + 1]
+            B_curr[k] = A_prev[k + 1] - ratio * A_curr[k + 1]
+
+        a[0] = A_prev[0] / A_curr[0]
+        b[0] = B_curr[0] / A_curr[0]
 
-        for j in range(2, N + 1):
+        for j in range(2, N):
+            A_next = [mpfr("0.0")] * N
+            B_next = [mpfr("0.0")] * N
+
+            ratio = B_curr[0] / A_curr[0]
             for k in range(N - j):
-                A[j][k] = B[j - 1][k + 1] - B[j - 1][0] / A[j - 1][0] * A[j - 1][k + 1]
+                A_next[k] = B_curr[k + 1] - ratio * A_curr[k + 1]
+
+            ratio = A_curr[0] / A_next[0]
             for k in range(N - j):
-                B[j][k] = A[j - 1][k + 1] - A[j - 1][0] / A[j][0] * A[j][k + 1]
+                B_next[k] = A_curr[k + 1] - ratio * A_next[k + 1]
 
-        a = [None] * (N - 1)
-        b = [None] * (N - 1)
+            a[j - 1] = A_curr[0] / A_next[0]
+            b[j - 1] = B_next[0] / A_next[0]
 
-        for m in range(1, N):
-            a[m - 1] = A[m - 1][0] / A[m][0]
-            b[m - 1] = B[m][0] / A[m][0]
+            A_curr, B_curr = A_next, B_next
 
         return a, b
 
+    @mpfr_precision
     def conti_frac_convers(self, N, large_h, small_h):
         a_square = [None] * (N - 1)
         small_b = [None] * (N - 1)
@@ -819,7 +1010,15 @@ class StructureFunction:
         small_c[0] = mpfr("1.0") / a_square[0]
         small_c[1] = -a_square[0] / small_b[0]
 
+        sum_cap = float(small_c[0])
+        sum_res = float(small_c[1])
+        stages = N - 1
+
         for i in range(1, N - 1):
+            if self.struc_limit_reached(sum_res, sum_cap):
+                stages = i
+                break
+
             small_c[2 * i] = mpfr("1.0") / (
                 small_c[2 * i - 2]
                 * small_c[2 * i - 1]
@@ -830,28 +1029,25 @@ class StructureFunction:
                 mpfr("1.0") + small_c[2 * i] * small_c[2 * i - 1] * small_b[i]
             )
 
+            sum_cap += float(small_c[2 * i])
+            sum_res += float(small_c[2 * i + 1])
+
         self.cau_res = np.zeros(N - 1)
         self.cau_cap = np.zeros(N - 1)
 
-        for i in range(0, N - 1):
+        for i in range(0, stages):
             self.cau_cap[i] = float(small_c[2 * i])
             self.cau_res[i] = float(small_c[2 * i + 1])
 
+        if stages < N - 1:
+            self.truncate_cauer_network(stages, N - 1)
+
         if np.any(self.cau_res[self.cau_res < 0.0]) or np.any(
             self.cau_res[self.cau_cap < 0.0]
         ):
             logger.error("\n negative values ecountered at length", len(self.cau_cap))
 
-        self.int_cau_res = np.cumsum(self.cau_res)
-        self.int_cau_cap = np.cumsum(self.cau_cap)
-
-        self.diff_struc = np.zeros(N - 2)
-
-        for i in range(len(self.int_cau_res) - 1):
-            if not (self.int_cau_res[i] - self.int_cau_res[i + 1]) == 0.0:
-                self.diff_struc[i] = (self.int_cau_cap[i] - self.int_cau_cap[i + 1]) / (
-                    self.int_cau_res[i] - self.int_cau_res[i + 1]
-                )
+        self.struc_post_processing()
 
     def lanczos(self):
 
@@ -877,13 +1073,26 @@ class StructureFunction:
             self.cau_res = np.add.reduceat(self.cau_res, indices)
             self.cau_cap = np.add.reduceat(self.cau_cap, indices)
 
-        self.int_cau_res = np.cumsum(self.cau_res)
-        self.int_cau_cap = np.cumsum(self.cau_cap)
+        self.struc_post_processing()
 
-        self.diff_struc = np.zeros(len(self.int_cau_res) - 1)
+    def rkpw(self):
 
-        for i in range(len(self.int_cau_res) - 1):
-            if not (self.int_cau_res[i] - self.int_cau_res[i + 1]) == 0.0:
-                self.diff_struc[i] = (self.int_cau_cap[i] - self.int_cau_cap[i + 1]) / (
-                    self.int_cau_res[i] - self.int_cau_res[i + 1]
-                )
+        res, cap = eng.rkpw_inner(self.therm_capa_fost, self.therm_resist_fost)
+
+        self.cau_res = np.array(res)
+        self.cau_cap = np.array(cap)
+
+        if len(self.cau_res) < len(self.therm_resist_fost):
+            logger.warning(
+                f"RKPW ladder truncated at {len(self.cau_res)} of {len(self.therm_resist_fost)} stages"
+            )
+
+        self.struc_post_processing()
+
+
+def cauer_transform_worker(module):
+    # entry point for worker processes and threads
+    module.cauer_transform()
+    return {
+        key: getattr(module, key) for key in STRUC_RESULT_KEYS if hasattr(module, key)
+    }
@@ -126,7 +126,17 @@ std_eval_defaults: dict = {
     #
     # Structure Function settings
     "struc_method": "sobhy",
-    #: str: Method for structure function calculation. Options: "sobhy", "lanczos", "boor_golub", "khatwani", "polylong".
+    #: str | list[str]: Method for structure function calculation. Options: "sobhy", "lanczos", "rkpw", "boor_golub", "khatwani", "polylong". In `standard_module` a list runs every method on the same Foster network and returns one module per method.
+    "foster_reduction_tol": None,
+    #: float | None: Merge adjacent Foster poles before the Cauer transformation. The step response of the reduced network deviates at most by this fraction of the total resistance. None disables the reduction.
+    "struc_max_resistance": None,
+    #: float | None: Stop the Cauer expansion once the cumulative resistance reaches this value (used by "polylong", "khatwani", "sobhy", "boor_golub"). None expands the full network.
+    "struc_max_capacitance": None,
+    #: float | None: Stop the Cauer expansion once the cumulative capacitance reaches this value (used by "polylong", "khatwani", "sobhy", "boor_golub"). None expands the full network.
+    "struc_resample_points": None,
+    #: int | None: Additionally resample the cumulative and differential structure function to this many points on a uniform resistance grid. None disables the resampling.
+    "keep_mpfr_intermediates": False,
+    #: bool: Keep the multiprecision Foster and impedance coefficient lists (``mpfr_z_num``, ``cleaned_mpfr_num``, ...) on the module after the structure function is computed. Only useful for debugging, they can take up a lot of memory.
     "timespec_interpolate_factor": 1.0,
     #: float: Interpolation factor for the time constant spectrum (used by Lanczos).
     "blockwise_sum_width": 20,
@@ -147,6 +157,10 @@ std_eval_defaults: dict = {
     #: float: Signal-to-noise ratio for adding noise to theoretical impedance data.
     "theo_delta": 0.5 * (2 * np.pi / 360),
     #: float: Angle (radians) to rotate Z(s) into the complex plane for theoretical calculations to avoid singularities.
+    "forward_model": "transmission_line",
+    #: str: Forward model of the theoretical and optimization modules. ``"transmission_line"`` evaluates the RC transmission line sections along the rotated path of ``theo_delta``, ``"poles"`` computes the time constants and Foster resistances of the sections from a finely discretised Cauer ladder and evaluates the impedance as a sum of exponentials.
+    "pole_cells": 16,
+    #: int: Number of lumped Cauer cells per section of the ``"poles"`` forward model. The discretisation error decreases with the square of the cell count.
     #
     # K-factor and voltage conversion, and extrapolate settings
     "calib": None,
@@ -200,11 +214,39 @@ std_eval_defaults: dict = {
     "opt_use_extrapolate": True,
     #: bool: Whether to use the extrapolated impedance curve during optimization.
     "opt_method": "Powell",
-    #: str: Optimization method to use (passed to scipy.optimize.minimize).
+    #: str: Optimization method to use (passed to scipy.optimize.minimize). Options: "Powell", "COBYLA", "L-BFGS-B", "SLSQP", "trust-constr", "differential_evolution". "L-BFGS-B", "SLSQP" and "trust-constr" use the analytic gradient of the impedance objective, "differential_evolution" is a global population based search (scipy.optimize.differential_evolution) evaluated with the batched forward model and refined with L-BFGS-B.
     "struc_init_method": "optimal_fit",
-    #: str: Method to determine the initial structure function approximation for optimization.
+    #: str: Method to determine the initial structure function approximation for optimization. ``"library"`` starts from the closest network of ``struc_library``.
+    "struc_library": None,
+    #: str | StructureLibrary | None: Structure library (or the file it was saved to) searched for the network with the most similar impedance when ``struc_init_method`` is ``"library"``.
     "opt_model_layers": 10,
     #: int: Number of RC layers (Foster elements) for the optimization model.
+    "opt_population_size": 15,
+    #: int: Population size multiplier of the "differential_evolution" optimization method, a generation holds ``opt_population_size`` times the number of free parameters networks.
+    "opt_max_generations": 200,
+    #: int: Maximum number of generations of the "differential_evolution" optimization method before the best member is refined.
+    "opt_batch_size": 256,
+    #: int: Maximum number of networks the batched forward model evaluates at once, limits the memory of the population based optimization.
+    "opt_warm_start": False,
+    #: bool: Start each optimization of a module set or bootstrap run from the optimized network of the previous module instead of fitting the structure function again. A different ``opt_model_layers`` is matched by splitting or merging sections.
+    "opt_multi_start": 1,
+    #: int: Number of starting networks for the impedance optimization. Besides the initial guess, randomly perturbed copies of it are optimized (in ``n_workers`` workers) and the best result is kept.
+    "opt_multi_start_spread": 0.2,
+    #: float: Standard deviation of the log-normal factors that perturb the resistances and capacitances of the additional starting networks.
+    "opt_multi_start_agree": 3,
+    #: int: Stop the multi-start optimization early once this many starts reached the best objective within ``opt_multi_start_tol``.
+    "opt_multi_start_tol": 0.01,
+    #: float: Relative tolerance on the objective under which two starts count as agreeing.
+    "opt_reduced_grid": False,
+    #: bool: Evaluate the optimization objective on a compact log time grid that ends one kernel width after the last measurement point and has the step ``opt_grid_step``. The full ``theo_time_size`` grid is only used for the reported curves.
+    "opt_grid_step": None,
+    #: float | None: Log time step of the reduced optimization grid. Defaults to a quarter of ``theo_delta``, which resolves the smoothing of the time constant spectrum. Never finer than the ``theo_time`` grid. The ``"poles"`` forward model always optimizes on a grid spanning the measurement, with a default step of 0.05.
+    "opt_fidelity_stages": 1,
+    #: int: Number of stages of the multi-fidelity optimization. Every stage before the last halves the layer count of the following one and doubles ``theo_delta``, so it optimizes a smoother model on a coarser reduced grid. The result is resampled to the next stage, the last stage runs at full fidelity.
+    "opt_cache_size_mb": 64.0,
+    #: float: Memory limit in MB of the rung impedance cache of the optimization forward model. The least recently used rungs are evicted first, 0 disables the cache.
+    "opt_cache_rel_tol": 1e-12,
+    #: float: Relative tolerance under which resistances and capacitances share a rung impedance cache entry. 0 uses the exact values as keys.
     #
     # Procedural settings
     "input_mode": "impedance",
@@ -213,10 +255,18 @@ std_eval_defaults: dict = {
     #: bool: Whether to calculate the structure function after impedance calculation.
     "only_make_z": False,
     #: bool: If True, only calculate the impedance curve and skip spectrum/structure function steps.
+    "n_workers": 1,
+    #: int: Number of workers for parallel evaluation steps (e.g. several ``struc_method`` values in one module, the members of a module set or the bootstrap repetitions). 1 runs everything in the calling process.
+    "parallel_backend": "process",
+    #: str: Executor used when ``n_workers`` > 1. Options: "process", "thread". Threads avoid copying the modules to worker processes, the multiprecision methods however hold the GIL.
     "repetitions": 1000,
     #: int: Number of repetitions for bootstrapping analysis.
     "random_seed": None,
-    #: int | None: Random seed for bootstrapping to ensure reproducibility.
+    #: int | None: Random seed for bootstrapping to ensure reproducibility. Every repetition draws from its own stream spawned from this seed, so the results do not depend on ``n_workers``.
+    "checkpoint_file": None,
+    #: str | None: File to which bootstrap_module stores the completed repetitions and optimization_module the best network found so far. An interrupted run continues with ``Evaluation.resume(checkpoint_file)``.
+    "checkpoint_interval": 60.0,
+    #: float: Minimum time in seconds between two checkpoints. The last bootstrap repetition is always stored.
     "bootstrap_mode": "from_data",
     #: str: Method for generating bootstrap samples. Options: "from_theo", "from_data", "given", "given_with_opt".
     #
@@ -1,5 +1,7 @@
 import numpy as np
-from numba import njit
+import cmath
+import math
+from numba import njit, prange
 
 
 @njit(cache=True)
@@ -252,7 +254,105 @@ def response_matrix(domain=np.array([]), x_len=float(1.0)):
     return response
 
 
-@njit(cache=True)
+@njit(cache=True, nogil=True)
+def rung_impedance(res, cap, sqrt_complex_time):
+
+    # characteristic impedance z_0 = sqrt(R / (C s)) and tanh(gamma l) with
+    # gamma l = sqrt(R C s) of a distributed RC section, fused in one pass
+    size = sqrt_complex_time.size
+    z_null = np.empty(size, dtype=np.complex128)
+    tanh_gamma_l = np.empty(size, dtype=np.complex128)
+
+    sqrt_rc = np.sqrt(res * cap)
+    sqrt_r_by_c = np.sqrt(res / cap)
+
+    for i in range(size):
+        z_null[i] = sqrt_r_by_c / sqrt_complex_time[i]
+        tanh_gamma_l[i] = cmath.tanh(sqrt_rc * sqrt_complex_time[i])
+
+    return z_null, tanh_gamma_l
+
+
+@njit(cache=True, parallel=True)
+def ladder_imag_batch(resistances, capacitances, sqrt_complex_time):
+
+    # imaginary part of the ladder input impedance for a population of networks,
+    # one network per row, the rows are distributed over the numba threads
+    n_pop, n_sec = resistances.shape
+    size = sqrt_complex_time.size
+    imag = np.empty((n_pop, size))
+
+    for p in prange(n_pop):
+        sqrt_rc = np.sqrt(resistances[p] * capacitances[p])
+        sqrt_r_by_c = np.sqrt(resistances[p] / capacitances[p])
+        for m in range(size):
+            last_z = 0.0j
+            for i in range(n_sec - 1, -1, -1):
+                z_null = sqrt_r_by_c[i] / sqrt_complex_time[m]
+                tanh_gamma_l = cmath.tanh(sqrt_rc[i] * sqrt_complex_time[m])
+                last_z = (
+                    z_null
+                    * (last_z + tanh_gamma_l * z_null)
+                    / (last_z * tanh_gamma_l + z_null)
+                )
+            imag[p, m] = last_z.imag
+
+    return imag
+
+
+# log of t / tau above which exp(-t / tau) is negligible and a pole has settled
+POLE_SETTLED_LOG = 3.7
+
+
+@njit(cache=True, nogil=True)
+def pole_impedance(log_time, log_tau, res):
+
+    # impedance sum_j R_j (1 - exp(-t / tau_j)) and its log time derivative
+    # sum_j R_j (t / tau_j) exp(-t / tau_j) on an ascending log time grid; a settled
+    # pole only adds its resistance, which is accumulated once at its settling index
+    size = log_time.size
+    imp_deriv = np.zeros(size)
+    imp = np.zeros(size)
+    settled = np.zeros(size + 1)
+
+    for j in range(res.size):
+        end = np.searchsorted(log_time, log_tau[j] + POLE_SETTLED_LOG)
+        for k in range(end):
+            x = math.exp(log_time[k] - log_tau[j])
+            imp_deriv[k] += res[j] * x * math.exp(-x)
+            imp[k] -= res[j] * math.expm1(-x)
+        settled[end] += res[j]
+
+    imp += np.cumsum(settled[:size])
+
+    return imp_deriv, imp
+
+
+@njit(cache=True, nogil=True)
+def pole_impedance_adjoint(log_time, log_tau, res, grad_imp):
+
+    # adjoint of the impedance of pole_impedance: gradients with respect to the log
+    # time constants and the resistances of the poles for the gradient grad_imp with
+    # respect to the impedance; a settled pole sees the tail sum of grad_imp
+    size = log_time.size
+    grad_log_tau = np.zeros(res.size)
+    grad_res = np.zeros(res.size)
+    tail = np.zeros(size + 1)
+    for k in range(size - 1, -1, -1):
+        tail[k] = tail[k + 1] + grad_imp[k]
+
+    for j in range(res.size):
+        end = np.searchsorted(log_time, log_tau[j] + POLE_SETTLED_LOG)
+        for k in range(end):
+            x = math.exp(log_time[k] - log_tau[j])
+            grad_res[j] -= grad_imp[k] * math.expm1(-x)
+            grad_log_tau[j] -= grad_imp[k] * res[j] * x * math.exp(-x)
+        grad_res[j] += tail[end]
+
+    return grad_log_tau, grad_res
+
+
+@njit(cache=True, nogil=True)
 def lanczos_inner(cap_fost=np.array([]), res_fost=np.array([])):
 
     C_diag = cap_fost
@@ -320,3 +420,135 @@ def lanczos_inner(cap_fost=np.array([]), res_fost=np.array([])):
         res_prev = res_next
 
     return res, cap
+
+
+@njit(cache=True, nogil=True)
+def rkpw_inner(cap_fost=np.array([]), res_fost=np.array([])):
+
+    # Z(s) = sum_i w_i / (s + x_i) with poles x_i = 1/(R_i C_i) and weights w_i = 1/C_i
+    poles = 1.0 / (res_fost * cap_fost)
+    weights = 1.0 / cap_fost
+
+    order = np.argsort(poles)
+    poles = poles[order]
+    weights = weights[order]
+
+    N = len(poles)
+
+    # Rutishauser-Kahan-Pal-Walker update (Gragg & Harrod): adds one pole at a time
+    # to the Jacobi matrix using Givens-like rotations, alpha is the diagonal and
+    # beta the squared off-diagonal with beta[0] holding the total weight
+    alpha = poles.copy()
+    beta = np.zeros(N)
+    beta[0] = weights[0]
+
+    for n in range(N - 1):
+        pn = weights[n + 1]
+        gam = 1.0
+        sig = 0.0
+        t = 0.0
+        x_new = poles[n + 1]
+
+        for k in range(n + 2):
+            rho = beta[k] + pn
+            tmp = gam * rho
+            tsig = sig
+
+            if rho <= 0.0:
+                gam = 1.0
+                sig = 0.0
+            else:
+                gam = beta[k] / rho
+                sig = pn / rho
+
+            tk = sig * (alpha[k] - x_new) - gam * t
+            alpha[k] = alpha[k] - (tk - t)
+            t = tk
+
+            if sig <= 0.0:
+                pn = tsig * beta[k]
+            else:
+                pn = t * t / sig
+
+            beta[k] = tmp
+
+    # The Cauer ladder is the LDL^T factorisation of the Jacobi matrix scaled by the
+    # capacitances: the pivots are 1/R_k, so every step stays positive for a valid network
+    res = np.zeros(N)
+    cap = np.zeros(N)
+
+    cap[0] = 1.0 / beta[0]
+    res[0] = 1.0 / (alpha[0] * cap[0])
+
+    length = N
+    for k in range(1, N):
+        cap_denom = beta[k] * res[k - 1] ** 2 * cap[k - 1]
+
+        if cap_denom <= 0.0:
+            length = k
+            break
+
+        cap_next = 1.0 / cap_denom
+        pivot = alpha[k] * cap_next - 1.0 / res[k - 1]
+
+        if pivot <= 0.0 or not np.isfinite(cap_next):
+            length = k
+            break
+
+        res_next = 1.0 / pivot
+
+        cap[k] = cap_next
+        res[k] = res_next
+
+    return res[:length], cap[:length]
+
+
+@njit(cache=True)
+def reduce_foster(
+    res_fost=np.array([]), log_tau=np.array([]), log_time=np.array([]), tolerance=1e-3
+):
+
+    # Merges runs of adjacent Foster poles into single RC pairs. A merged pair keeps the
+    # resistance and the first moment sum(R_i * tau_i) of its run, a run is only extended
+    # while the step response of the pair deviates less than tolerance * R from the run
+
+    time = np.exp(log_time)
+    tau = np.exp(log_tau)
+
+    N = len(res_fost)
+
+    red_res = np.zeros(N)
+    red_tau = np.zeros(N)
+
+    run_resp = np.zeros(len(time))
+    n_red = 0
+    start = 0
+
+    while start < N:
+        run_res = res_fost[start]
+        run_moment = res_fost[start] * tau[start]
+        run_resp[:] = res_fost[start] * (1.0 - np.exp(-time / tau[start]))
+
+        stop = start + 1
+        while stop < N:
+            new_res = run_res + res_fost[stop]
+            new_moment = run_moment + res_fost[stop] * tau[stop]
+            new_resp = run_resp + res_fost[stop] * (1.0 - np.exp(-time / tau[stop]))
+
+            merged_resp = new_res * (1.0 - np.exp(-time * new_res / new_moment))
+            error = np.max(np.abs(new_resp - merged_resp))
+
+            if error > tolerance * new_res:
+                break
+
+            run_res = new_res
+            run_moment = new_moment
+            run_resp[:] = new_resp
+            stop += 1
+
+        red_res[n_red] = run_res
+        red_tau[n_red] = run_moment / run_res
+        n_red += 1
+        start = stop
+
+    return red_res[:n_red], red_tau[:n_red]
@@ -0,0 +1,212 @@
+import numpy as np
+import logging
+import os
+
+from .utils import transient_utils as utl
+from .utils import optimizer_utils as optu
+from . import transient_optimizer as trop
+from . import transient_defaults as dbase
+
+logger = logging.getLogger("PyRthLogger")
+
+
+class StructureLibrary:
+    """
+    Persistent collection of thermal networks and their impedance curves with a
+    nearest-neighbour search over the curves, used to initialize the impedance
+    optimization with the closest known network.
+
+    Networks are stored as cumulative resistances and capacities, like the
+    optimized networks of the optimization module, and their impedances are
+    resampled to the common log time grid of the library.
+    """
+
+    def __init__(self, log_time):
+        self.log_time = np.asarray(log_time, dtype=float)
+        self.curves = np.empty((0, self.log_time.size))
+        self.networks = []
+        self.labels = []
+
+    def __len__(self):
+        return len(self.networks)
+
+    def _append(self, networks, curves, labels):
+        self.curves = np.vstack([self.curves, curves])
+        self.networks.extend(networks)
+        self.labels.extend(labels)
+
+    def add(self, res, cap, log_time, impedance, label=None):
+        """
+        Add a network with cumulative resistances res and capacities cap and its
+        impedance given on log_time.
+        """
+        if label is None:
+            label = f"network_{len(self)}"
+
+        self._append(
+            [(np.asarray(res, dtype=float), np.asarray(cap, dtype=float))],
+            np.interp(self.log_time, log_time, impedance)[np.newaxis, :],
+            [label],
+        )
+
+    def add_module(self, module):
+        """
+        Add the optimized network and impedance of an optimization module.
+        """
+        self.add(
+            module.fin_res,
+            module.fin_cap,
+            module.theo_log_time,
+            module.theo_impedance,
+            module.label,
+        )
+
+    def add_theoretical(
+        self,
+        resistances,
+        capacitances,
+        labels=None,
+        theo_time=None,
+        theo_time_size=None,
+        theo_delta=None,
+        forward_model=None,
+        pole_cells=None,
+    ):
+        """
+        Add networks given by the section resistances and capacities of the
+        theoretical module, one network per entry of resistances and capacitances.
+        Their impedances are computed with forward_model, like in the theoretical
+        and optimization modules. Transmission line networks with the same number
+        of sections are computed in one batch.
+        """
+        if len(resistances) != len(capacitances):
+            raise ValueError(
+                "resistances and capacitances must contain the same number of networks."
+            )
+
+        defaults = dbase.std_eval_defaults
+        if theo_time is None:
+            theo_time = defaults["theo_time"]
+        if theo_time_size is None:
+            theo_time_size = defaults["theo_time_size"]
+        if theo_delta is None:
+            theo_delta = defaults["theo_delta"]
+        if forward_model is None:
+            forward_model = defaults["forward_model"]
+        if pole_cells is None:
+            pole_cells = defaults["pole_cells"]
+        if labels is None:
+            labels = [f"network_{len(self) + n}" for n in range(len(resistances))]
+
+        theo_log_time = np.linspace(
+            np.log(theo_time[0]), np.log(theo_time[1]), theo_time_size
+        )
+        optimizer = trop.TransientOptimizer(
+            {"forward_model": forward_model, "pole_cells": pole_cells}
+        )
+
+        if optimizer.forward_model == "poles":
+            for res, cap, label in zip(resistances, capacitances, labels):
+                res = np.asarray(res, dtype=float)
+                cap = np.asarray(cap, dtype=float)
+                _, _, impedance = optimizer.network_response(
+                    theo_log_time, theo_delta, res, cap
+                )
+                self._append(
+                    [(np.cumsum(res), np.cumsum(cap))],
+                    np.interp(self.log_time, theo_log_time, impedance)[np.newaxis, :],
+                    [label],
+                )
+        else:
+            self._add_transmission_line_batches(
+                resistances, capacitances, labels, optimizer, theo_log_time, theo_delta
+            )
+
+        logger.info(f"Structure library holds {len(self)} networks")
+
+    def _add_transmission_line_batches(
+        self, resistances, capacitances, labels, optimizer, theo_log_time, theo_delta
+    ):
+        # networks with the same number of sections share one batched forward model
+        batch_size = dbase.std_eval_defaults["opt_batch_size"]
+        layers = np.array([len(res) for res in resistances])
+        for n_layers in np.unique(layers):
+            members = np.flatnonzero(layers == n_layers)
+            for first in range(0, members.size, batch_size):
+                batch = members[first : first + batch_size]
+                res_batch = np.array([resistances[n] for n in batch], dtype=float)
+                cap_batch = np.array([capacitances[n] for n in batch], dtype=float)
+
+                time_const = optimizer.struc_to_time_const_batch(
+                    theo_log_time, theo_delta, res_batch, cap_batch
+                )
+                _, impedance = utl.time_const_to_imp_batch(theo_log_time, time_const)
+
+                self._append(
+                    [
+                        (np.cumsum(res), np.cumsum(cap))
+                        for res, cap in zip(res_batch, cap_batch)
+                    ],
+                    optu.interp_batch(self.log_time, theo_log_time, impedance),
+                    [labels[n] for n in batch],
+                )
+
+    def nearest(self, log_time, impedance, k=1):
+        """
+        Indices and rms distances of the k networks whose impedance is closest to
+        impedance on log_time. Only the part of the library grid covered by
+        log_time is compared.
+        """
+        if len(self) == 0:
+            raise ValueError("The structure library is empty.")
+
+        covered = (self.log_time >= log_time[0]) & (self.log_time <= log_time[-1])
+        if not np.any(covered):
+            raise ValueError(
+                "The impedance does not overlap the time grid of the structure library."
+            )
+
+        target = np.interp(self.log_time[covered], log_time, impedance)
+        distance = np.sqrt(np.mean((self.curves[:, covered] - target) ** 2, axis=1))
+
+        index = np.argsort(distance, kind="stable")[:k]
+        return index, distance[index]
+
+    def save(self, path):
+        """
+        Store the library in a compressed numpy archive.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        layers = np.array([len(res) for res, _ in self.networks], dtype=int)
+        np.savez_compressed(
+            path,
+            log_time=self.log_time,
+            curves=self.curves,
+            layers=layers,
+            res=np.concatenate([res for res, _ in self.networks] or [np.empty(0)]),
+            cap=np.concatenate([cap for _, cap in self.networks] or [np.empty(0)]),
+            labels=np.array(self.labels, dtype=str),
+        )
+
+    @classmethod
+    def load(cls, path):
+        """
+        Load a library stored with save.
+        """
+        with np.load(path) as archive:
+            library = cls(archive["log_time"])
+            splits = np.cumsum(archive["layers"])[:-1]
+            library._append(
+                list(
+                    zip(
+                        np.split(archive["res"], splits),
+                        np.split(archive["cap"], splits),
+                    )
+                ),
+                archive["curves"],
+                list(archive["labels"]),
+            )
+        return library
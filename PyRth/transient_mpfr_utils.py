@@ -1,3 +1,4 @@
+import sys
 import gmpy2 as gp
 from gmpy2 import mpfr
 import numpy as np
@@ -131,6 +132,19 @@ def mpfr_weighted_self_product(poles, p1, weights):
     return prod
 
 
+def mpfr_weighted_value_product(vals_1, vals_2, weights):
+
+    # weighted inner product of two polynomials given by their values at the poles
+
+    prod = mpfr("0.0")
+    N = len(weights)
+
+    for i in range(N):
+        prod = prod + vals_1[i] * vals_2[i] * weights[i]
+
+    return prod
+
+
 def mpfr_horner_poly_eval(val, poly):
 
     N = len(poly)
@@ -249,3 +263,9 @@ def precision_polydiv(numerator, denominator):
         remainder[l] = mpfr("0.0")
 
     return (quotient, remainder)
+
+
+def mpfr_list_nbytes(values):
+
+    # size of a list of mpfr numbers including their limbs
+    return sys.getsizeof(values) + sum(sys.getsizeof(value) for value in values)
@@ -1,24 +1,135 @@
 import numpy as np
 import scipy.optimize as opt
-import functools
+import scipy.linalg as sla
 import logging
-import cmath as cm
 import math
+from collections import OrderedDict
 from scipy.integrate import cumulative_trapezoid
 
 from .utils import transient_utils as utl
 from .utils import optimizer_utils as optu
+from . import transient_engine as eng
+from . import transient_defaults as dbase
 
 logger = logging.getLogger("PyRthLogger")
 
+FORWARD_MODELS = ["transmission_line", "poles"]
+# log time step of the objective grid of the pole forward model
+POLE_GRID_STEP = 0.05
+
+# parameters read by TransientOptimizer, the only ones sent to multi-start workers
+OPTIMIZER_PARAMETERS = [
+    "opt_cache_size_mb",
+    "opt_cache_rel_tol",
+    "forward_model",
+    "pole_cells",
+    "opt_grid_step",
+    "opt_batch_size",
+    "opt_reduced_grid",
+    "opt_fidelity_stages",
+    "opt_max_generations",
+    "opt_population_size",
+    "random_seed",
+]
+
+
+class RungImpedanceCache:
+    # least recently used cache for the rung impedances of one complex time grid,
+    # bounded by the memory of the stored arrays
+
+    def __init__(self, max_bytes, rel_tol):
+        if max_bytes < 0:
+            raise ValueError(
+                f"Parameter 'opt_cache_size_mb' must be non-negative, got {max_bytes / 1e6}"
+            )
+        if rel_tol < 0:
+            raise ValueError(
+                f"Parameter 'opt_cache_rel_tol' must be non-negative, got {rel_tol}"
+            )
+
+        self.max_bytes = max_bytes
+        self.rel_tol = rel_tol
+        self.entries = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def clear(self):
+        self.entries.clear()
+        self.nbytes = 0
+
+    @property
+    def hit_rate(self):
+        calls = self.hits + self.misses
+        return self.hits / calls if calls > 0 else 0.0
+
+    def key(self, res, cap):
+        # quantise on a logarithmic grid so values within rel_tol share an entry
+        if self.rel_tol > 0 and res > 0 and cap > 0:
+            return (
+                round(math.log(res) / self.rel_tol),
+                round(math.log(cap) / self.rel_tol),
+            )
+        return (float(res), float(cap))
+
+    def get(self, key):
+        value = self.entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        nbytes = sum(arr.nbytes for arr in value)
+        if nbytes > self.max_bytes or key in self.entries:
+            return
+
+        self.entries[key] = value
+        self.nbytes += nbytes
+
+        while self.nbytes > self.max_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.nbytes -= sum(arr.nbytes for arr in evicted)
+
 
 class TransientOptimizer:
     def __init__(self, parameters=None):
         self.parameters = parameters or {}
         # Replace globals with instance attributes:
         self.complex_time = None
+        self.sqrt_complex_time = None
         self.delta_in_global_complex_time = None
+        self.complex_time_grid = None
+        self.rung_cache = RungImpedanceCache(
+            self.parameters.get(
+                "opt_cache_size_mb", dbase.std_eval_defaults["opt_cache_size_mb"]
+            )
+            * 1e6,
+            self.parameters.get(
+                "opt_cache_rel_tol", dbase.std_eval_defaults["opt_cache_rel_tol"]
+            ),
+        )
+        self.forward_model = self.parameters.get(
+            "forward_model", dbase.std_eval_defaults["forward_model"]
+        )
+        if self.forward_model not in FORWARD_MODELS:
+            raise ValueError(
+                f"Parameter 'forward_model' must be one of {FORWARD_MODELS}, got '{self.forward_model}'"
+            )
+        self.pole_cells = self.parameters.get(
+            "pole_cells", dbase.std_eval_defaults["pole_cells"]
+        )
+        if not isinstance(self.pole_cells, int) or self.pole_cells < 1:
+            raise ValueError(
+                f"Parameter 'pole_cells' must be a positive integer, got {self.pole_cells}"
+            )
         self.eval_count = 0
+        # called with the best network and objective after every optimizer iteration
+        self.checkpoint_hook = None
+        self.ladder_workspace = None
         self.results_obj = []
         self.results_res = []
         self.results_cap = []
@@ -27,50 +138,271 @@ class TransientOptimizer:
     # Structure Functions
     # ---------------------------
 
-    def cm_tanh(self, arr):
-        # Element-wise hyperbolic tangent using math.tanh
-        return np.array([cm.tanh(val) for val in arr])
+    def set_complex_time(self, theo_log_time, delta):
+        grid = (theo_log_time[0], theo_log_time[-1], theo_log_time.size, delta)
+        if grid == self.complex_time_grid:
+            return
+
+        self.complex_time = -complex(math.cos(delta), math.sin(delta)) * np.exp(
+            -theo_log_time
+        )
+        self.sqrt_complex_time = np.sqrt(self.complex_time)
+        self.delta_in_global_complex_time = delta
+        self.complex_time_grid = grid
+        # cached rungs belong to the previous grid
+        self.rung_cache.clear()
+
+    def reduced_log_time(self, theo_log_time, log_time, delta):
+        # compact grid for the objective: it keeps the start of theo_log_time, so the
+        # early time constants still contribute, ends one kernel width after the last
+        # measurement point and resolves the smoothing of the spectrum by the angle delta
+        step = self.parameters.get("opt_grid_step")
+        if self.forward_model == "poles":
+            # the pole model needs no origin and has no smoothing to resolve, the
+            # impedance is exact at every grid point and smooth in between
+            step = step or POLE_GRID_STEP
+            size = max(int(np.ceil((log_time[-1] - log_time[0]) / step)) + 1, 2)
+            return np.linspace(log_time[0], log_time[-1], size)
+
+        step = step or delta / 4
+        if step <= theo_log_time[1] - theo_log_time[0]:
+            return theo_log_time
+
+        end = min(theo_log_time[-1], log_time[-1] + utl.TIME_CONST_KERNEL_WIDTH)
+        size = max(int(np.ceil((end - theo_log_time[0]) / step)) + 1, 2)
+        return np.linspace(theo_log_time[0], end, size)
 
-    @functools.lru_cache(maxsize=80)
     def give_rung_imp(self, res, cap):
-        # Uses self.complex_time which must be set before calling this method.
-        gamma_l = np.sqrt(res * cap * self.complex_time)
-        z_null = np.sqrt(res / (cap * self.complex_time))
-        tanh_gamma_l = self.cm_tanh(gamma_l)
-        return (z_null, tanh_gamma_l)
+        # Uses self.sqrt_complex_time which must be set before calling this method.
+        key = self.rung_cache.key(res, cap)
+        rung = self.rung_cache.get(key)
+        if rung is None:
+            rung = eng.rung_impedance(res, cap, self.sqrt_complex_time)
+            self.rung_cache.put(key, rung)
+        return rung
+
+    def get_ladder_workspace(self):
+        # complex buffers for the ladder recursion, reused as long as the time grid keeps its size
+        size = self.complex_time.size
+        if self.ladder_workspace is None or self.ladder_workspace.shape[1] != size:
+            self.ladder_workspace = np.empty((3, size), dtype=complex)
+        return self.ladder_workspace
 
     def struc_to_time_const(self, theo_log_time, delta, resistances, capacitances):
-        # Update instance attributes instead of using globals
-        if self.complex_time is None:
-            self.complex_time = -complex(math.cos(delta), math.sin(delta)) * np.exp(
-                -theo_log_time
+        self.set_complex_time(theo_log_time, delta)
+
+        # input impedance of the ladder from the last section towards the first,
+        # z = z_0 (z_last + t z_0) / (z_last t + z_0) with t = tanh(gamma l)
+        last_z, numerator, denominator = self.get_ladder_workspace()
+        last_z.fill(0.0)
+        for i in range(len(capacitances) - 1, -1, -1):
+            z_null, tanh_gamma_l = self.give_rung_imp(resistances[i], capacitances[i])
+            np.multiply(tanh_gamma_l, z_null, out=numerator)
+            numerator += last_z
+            np.multiply(last_z, tanh_gamma_l, out=denominator)
+            denominator += z_null
+            np.multiply(z_null, numerator, out=last_z)
+            last_z /= denominator
+        self.eval_count += 1
+
+        unscaled_time_const = last_z.imag / np.pi
+
+        time_const = unscaled_time_const * (theo_log_time[1] - theo_log_time[0])
+
+        return time_const
+
+    def struc_to_time_const_batch(
+        self, theo_log_time, delta, resistances, capacitances
+    ):
+        # struc_to_time_const for a population of networks, one per row
+        self.set_complex_time(theo_log_time, delta)
+
+        unscaled_time_const = (
+            eng.ladder_imag_batch(
+                np.ascontiguousarray(resistances, dtype=float),
+                np.ascontiguousarray(capacitances, dtype=float),
+                self.sqrt_complex_time,
             )
-            self.delta_in_global_complex_time = delta
+            / np.pi
+        )
+        self.eval_count += len(resistances)
+
+        return unscaled_time_const * (theo_log_time[1] - theo_log_time[0])
+
+    def ladder_poles(self, resistances, capacitances):
+        # every section is split into pole_cells lumped cells with the capacity shared
+        # by the cell ends, the far end of the last section is held at ambient. The
+        # ladder matrix C^-1/2 K C^-1/2 = F^T F with the upper bidiagonal
+        # F = G^1/2 D C^-1/2 (D the node differences), whose singular value
+        # decomposition follows from the zero diagonal Golub-Kahan form to high
+        # relative accuracy, even for sections spanning many decades
+        cell_res = np.repeat(np.asarray(resistances) / self.pole_cells, self.pole_cells)
+        cell_cap = np.repeat(
+            np.asarray(capacitances) / self.pole_cells, self.pole_cells
+        )
+        node_cap = 0.5 * cell_cap
+        node_cap[1:] += 0.5 * cell_cap[:-1]
+
+        size = cell_res.size
+        diagonal = 1.0 / np.sqrt(cell_res * node_cap)
+        upper = -1.0 / np.sqrt(cell_res[:-1] * node_cap[1:])
+        off_diagonal = np.empty(2 * size - 1)
+        off_diagonal[0::2] = diagonal
+        off_diagonal[1::2] = upper
+
+        singular, vectors = sla.eigh_tridiagonal(np.zeros(2 * size), off_diagonal)
+        self.eval_count += 1
+
+        # the positive half holds the singular values, the eigenvectors interleave
+        # the right and left singular vectors scaled by 1 / sqrt(2)
+        right = math.sqrt(2.0) * vectors[0::2, size:]
+        left = math.sqrt(2.0) * vectors[1::2, size:]
+
+        return cell_res, node_cap, diagonal, upper, singular[size:], left, right
+
+    def ladder_to_poles(self, ladder):
+        # time constants tau_j = 1 / sigma_j^2 and Foster resistances
+        # R_j = v_j0^2 tau_j / C_0 of the ladder decomposition
+        cell_res, node_cap, diagonal, upper, singular, left, right = ladder
+        log_tau = -2.0 * np.log(singular)
+        res = right[0] ** 2 * np.exp(log_tau) / node_cap[0]
+
+        return log_tau, res
+
+    def struc_to_poles(self, resistances, capacitances):
+        # log time constants and Foster resistances of the network
+        return self.ladder_to_poles(self.ladder_poles(resistances, capacitances))
+
+    def ladder_poles_grad(self, ladder, grad_log_tau, grad_res):
+        # gradient with respect to the section resistances and capacitances for the
+        # gradients with respect to the log time constants and Foster resistances,
+        # through the perturbation of the singular values and of the first component
+        # of the right singular vectors
+        cell_res, node_cap, diagonal, upper, singular, left, right = ladder
+        eigen = singular**2
+        log_tau, pole_res = self.ladder_to_poles(ladder)
+
+        # sensitivities to d sigma_j and d v_j0
+        grad_singular = -2.0 * (grad_log_tau + grad_res * pole_res) / singular
+        grad_first = 2.0 * grad_res * right[0] / (node_cap[0] * eigen)
+
+        # d v_j0 = sum_k v_k0 (sigma_j u_j^T dF v_k + sigma_k u_k^T dF v_j) / (l_j - l_k),
+        # collected with d sigma_j = u_j^T dF v_j into dL = sum_ab H_ab u_a^T dF v_b
+        gap = eigen[:, np.newaxis] - eigen[np.newaxis, :]
+        np.fill_diagonal(gap, np.inf)
+        coupling = grad_first[:, np.newaxis] * right[0][np.newaxis, :] / gap
+        weights = (
+            coupling * singular[:, np.newaxis] + (coupling * singular[np.newaxis, :]).T
+        )
+        np.fill_diagonal(weights, grad_singular)
+
+        # dL / dF = U H V^T on the two diagonals of F
+        left_weights = left @ weights
+        grad_diagonal = np.sum(left_weights * right, axis=1) * diagonal
+        grad_upper = np.sum(left_weights[:-1] * right[1:], axis=1) * upper
+
+        # F_kk = (r_k c_k)^-1/2 and F_k,k+1 = -(r_k c_k+1)^-1/2
+        grad_cell_res = -0.5 * grad_diagonal / cell_res
+        grad_cell_res[:-1] -= 0.5 * grad_upper / cell_res[:-1]
+        grad_node_cap = -0.5 * grad_diagonal / node_cap
+        grad_node_cap[1:] -= 0.5 * grad_upper / node_cap[1:]
+        grad_node_cap[0] -= np.dot(grad_res, pole_res) / node_cap[0]
+
+        grad_cell_cap = 0.5 * grad_node_cap
+        grad_cell_cap[:-1] += 0.5 * grad_node_cap[1:]
+
+        return (
+            grad_cell_res.reshape(-1, self.pole_cells).sum(axis=1) / self.pole_cells,
+            grad_cell_cap.reshape(-1, self.pole_cells).sum(axis=1) / self.pole_cells,
+        )
+
+    def poles_to_time_const(self, theo_log_time, delta, log_tau, res):
+        # time constant spectrum of the Foster network along the rotated path of
+        # struc_to_time_const, Im Z(s) / pi for the Foster impedance
+        self.set_complex_time(theo_log_time, delta)
+
+        foster = res / (1.0 + self.complex_time[:, np.newaxis] * np.exp(log_tau))
+        unscaled_time_const = np.sum(foster.imag, axis=1) / np.pi
+
+        return unscaled_time_const * (theo_log_time[1] - theo_log_time[0])
+
+    def network_response(self, theo_log_time, delta, resistances, capacitances):
+        # time constant spectrum, impedance derivative and impedance of the network,
+        # computed with the forward model selected by forward_model
+        if self.forward_model == "poles":
+            log_tau, res = self.struc_to_poles(resistances, capacitances)
+            time_const = self.poles_to_time_const(theo_log_time, delta, log_tau, res)
+            imp_deriv, impedance = eng.pole_impedance(theo_log_time, log_tau, res)
         else:
-            if self.delta_in_global_complex_time != delta:
-                self.complex_time = -complex(math.cos(delta), math.sin(delta)) * np.exp(
-                    -theo_log_time
-                )
-                self.delta_in_global_complex_time = delta
-                self.give_rung_imp.cache_clear()
+            time_const = self.struc_to_time_const(
+                theo_log_time, delta, resistances, capacitances
+            )
+            imp_deriv, impedance = self.time_const_to_imp(theo_log_time, time_const)
+
+        return time_const, imp_deriv, impedance
+
+    def ladder_impedances(self, theo_log_time, delta, resistances, capacitances):
+        # impedance seen at the input of every section, row 0 is the ladder input
+        # impedance of struc_to_time_const, the last row the open end
+        self.set_complex_time(theo_log_time, delta)
 
         n = len(capacitances)
-        last_z = 0.0
-        for i in np.arange(n - 1, -1, -1):
+        loads = np.zeros((n + 1, self.complex_time.size), dtype=complex)
+        for i in range(n - 1, -1, -1):
             z_null, tanh_gamma_l = self.give_rung_imp(resistances[i], capacitances[i])
-            z_result = (
+            loads[i] = (
                 z_null
-                * (last_z + tanh_gamma_l * z_null)
-                / (last_z * tanh_gamma_l + z_null)
+                * (loads[i + 1] + tanh_gamma_l * z_null)
+                / (loads[i + 1] * tanh_gamma_l + z_null)
             )
-            last_z = z_result
         self.eval_count += 1
 
-        unscaled_time_const = np.imag(z_result) / np.pi
+        return loads
 
-        time_const = unscaled_time_const * (theo_log_time[1] - theo_log_time[0])
+    def ladder_grad(self, loads, resistances, capacitances, grad_imag):
+        # gradient of sum(grad_imag * Im(Z_in)) with respect to the section
+        # resistances and capacitances, propagated through the ladder recursion
 
-        return time_const
+        n = len(capacitances)
+        grad_res = np.zeros(n)
+        grad_cap = np.zeros(n)
+        # dZ_in / dz_i, product of the load derivatives of the preceding sections
+        prefix = np.ones(self.complex_time.size, dtype=complex)
+
+        for i in range(n):
+            z_null, tanh_gamma_l = self.give_rung_imp(resistances[i], capacitances[i])
+            load = loads[i + 1]
+
+            numerator = z_null * (load + tanh_gamma_l * z_null)
+            denominator_sq = (load * tanh_gamma_l + z_null) ** 2
+            d_z_null = (
+                (load + 2.0 * tanh_gamma_l * z_null) * (load * tanh_gamma_l + z_null)
+                - numerator
+            ) / denominator_sq
+            d_tanh = (
+                z_null**2 * (load * tanh_gamma_l + z_null) - numerator * load
+            ) / denominator_sq
+            d_load = (
+                z_null**2 * (1.0 - tanh_gamma_l) * (1.0 + tanh_gamma_l) / denominator_sq
+            )
+
+            # z_0 ~ sqrt(R / C) and gamma l ~ sqrt(R C)
+            gamma_l = (
+                math.sqrt(resistances[i] * capacitances[i]) * self.sqrt_complex_time
+            )
+            part_z_null = d_z_null * z_null
+            part_gamma = d_tanh * (1.0 - tanh_gamma_l) * (1.0 + tanh_gamma_l) * gamma_l
+
+            grad_res[i] = np.dot(
+                grad_imag, (prefix * (part_z_null + part_gamma)).imag
+            ) / (2.0 * resistances[i])
+            grad_cap[i] = np.dot(
+                grad_imag, (prefix * (part_gamma - part_z_null)).imag
+            ) / (2.0 * capacitances[i])
+
+            prefix *= d_load
+
+        return grad_res, grad_cap
 
     def struc_params_to_func(self, number, resistances, capacities):
         N = len(resistances)
@@ -87,51 +419,22 @@ class TransientOptimizer:
         sum_cap_int = np.interp(sum_res_int, sum_res, sum_cap)
         return sum_res_int, sum_cap_int
 
-    def opt_struc_params_to_func(self, args, r_org):
-        args1 = np.sort(args[: len(args) // 2], kind="stable")
-        args2 = np.sort(args[len(args) // 2 :], kind="stable")
-        c_vals = np.interp(r_org, args1, np.exp(args2))
-        return c_vals
-
     # ---------------------------
     # Structural Optimization Helpers
     # ---------------------------
 
-    def to_minimize_struc(self, arguments, r_org, c_org):
-        c_2 = self.opt_struc_params_to_func(arguments, r_org)
-        return optu.weighted_diff(r_org, c_org, np.log(c_2))
-
     def struc_x_sample(self, x, y, N):
         new_x = np.linspace(x[0], 0.03 * x[0] + 0.97 * x[-1], N, endpoint=True)
         new_y = np.interp(new_x, x, y)
         return new_x, new_y
 
-    def generate_init_vals(self, N, x, y):
-        npts = len(x)
-        arc = 0.0
-        for k in range(npts - 1):
-            arc += np.sqrt((x[k] - x[k + 1]) ** 2 + (y[k] - y[k + 1]) ** 2)
-        parts = (arc / (N - 1)) * 0.99
-        next_stage = parts
-        counter = 0
-        init_stages_R = np.zeros(N)
-        init_stages_C = np.zeros(N)
-        init_stages_R[0] = x[0]
-        init_stages_C[0] = y[0]
-        segm = 0
-        for k in range(npts - 1):
-            increm = np.sqrt((x[k] - x[k + 1]) ** 2 + (y[k] - y[k + 1]) ** 2)
-            segm += increm
-            if segm > next_stage:
-                delta = segm - next_stage
-                next_stage += parts
-                while delta > 0 and counter < N - 1:
-                    fraction = delta / increm
-                    counter += 1
-                    init_stages_R[counter] = x[k] + fraction * abs(x[k + 1] - x[k])
-                    init_stages_C[counter] = y[k] + fraction * abs(y[k + 1] - y[k])
-                    delta -= parts
-        return init_stages_R, init_stages_C
+    def struc_fit_residual(
+        self, cap_log_knots, res_knots, res_fine, cap_log_fine, weight
+    ):
+        # log error of the ladder structure function, linear in the capacity
+        # between the knots, weighted for the trapezoidal rule
+        cap_fine = np.interp(res_fine, res_knots, np.exp(cap_log_knots))
+        return weight * (np.log(cap_fine) - cap_log_fine)
 
     def optimize_theo_struc(self, res_l, cap_l, N):
         cut_frac = 0.05
@@ -144,22 +447,30 @@ class TransientOptimizer:
         N_fine = int(1e4)
         res_fine = np.linspace(res[0], res[-1], N_fine)
         cap_log_fine = np.interp(res_fine, res, cap_log)
-        r_init, c_init_log = self.generate_init_vals(N, res, cap_log)
-        c_init = np.exp(c_init_log)
-        init_vect = np.concatenate([r_init, c_init_log])
-        bounds_res = [(res[0], res_l[-1])] * N
-        bounds_cap = [(cap_log[0], cap_log[-1])] * N
-        opt_result = opt.minimize(
-            self.to_minimize_struc,
-            init_vect,
-            args=(res_fine, cap_log_fine),
-            method="Powell",
-            bounds=bounds_res + bounds_cap,
-            options={"ftol": 0.0001},
+
+        # knots of the best polyline through points of the curve, then least
+        # squares capacities at these knots
+        knots = optu.piecewise_linear_knots(res_fine, cap_log_fine, N)
+        r_init = res_fine[knots]
+        c_init = np.exp(cap_log_fine[knots])
+        weight = np.sqrt(optu.trapz_weights(res_fine))
+        opt_result = opt.least_squares(
+            self.struc_fit_residual,
+            cap_log_fine[knots],
+            args=(r_init, res_fine, cap_log_fine, weight),
         )
-        opt_res = np.sort(opt_result.x[:N], kind="stable")
-        opt_cap = np.exp(np.sort(opt_result.x[N:], kind="stable"))
+
+        opt_res = r_init.copy()
+        opt_cap = np.exp(np.sort(opt_result.x, kind="stable"))
         opt_res[-1] = res_l[-1]
+        if N == 1:
+            # the polyline has at least two knots, a single section ends at the last one
+            opt_res, opt_cap, r_init, c_init = (
+                opt_res[-1:],
+                opt_cap[-1:],
+                r_init[-1:],
+                c_init[-1:],
+            )
         struc_marker = (opt_res, opt_cap, r_init, c_init)
         return struc_marker, opt_result
 
@@ -170,6 +481,30 @@ class TransientOptimizer:
         # avoid small differences that break the nummerics
         return arr
 
+    def sort_and_lim_diff_batch(self, arr):
+        # sort_and_lim_diff for every row of arr
+        arr = np.sort(arr, axis=-1, kind="stable")
+        arr[:, 1:] = arr[:, 1:] - arr[:, :-1]
+        arr[arr < 1e-10] = 1e-10
+        return arr
+
+    def sort_and_lim_diff_grad(self, arr, grad):
+        # gradient with respect to arr given the gradient with respect to sort_and_lim_diff(arr)
+        order = np.argsort(arr, kind="stable")
+        arr_sorted = arr[order]
+
+        diff = arr_sorted.copy()
+        diff[1:] = arr_sorted[1:] - arr_sorted[:-1]
+        # clamped differences do not depend on arr
+        grad = np.where(diff < 1e-10, 0.0, grad)
+
+        grad_sorted = grad.copy()
+        grad_sorted[:-1] -= grad[1:]
+
+        grad_arr = np.empty_like(grad_sorted)
+        grad_arr[order] = grad_sorted
+        return grad_arr
+
     # ---------------------------
     # Impedance Optimization Functions
     # ---------------------------
@@ -185,17 +520,160 @@ class TransientOptimizer:
     ):
         opt_res = self.sort_and_lim_diff(arguments[:N])
         opt_cap = self.sort_and_lim_diff(np.exp(arguments[N:]))
-        theo_time_const = self.struc_to_time_const(
-            theo_log_time, theo_delta, opt_res, opt_cap
-        )
-        theo_imp_deriv, theo_impedance = self.time_const_to_imp(
-            theo_log_time, theo_time_const
-        )
+        if self.forward_model == "poles":
+            log_tau, res = self.struc_to_poles(opt_res, opt_cap)
+            theo_imp_deriv, theo_impedance = eng.pole_impedance(
+                theo_log_time, log_tau, res
+            )
+        else:
+            theo_time_const = self.struc_to_time_const(
+                theo_log_time, theo_delta, opt_res, opt_cap
+            )
+            theo_imp_deriv, theo_impedance = self.time_const_to_imp(
+                theo_log_time, theo_time_const
+            )
         theo_impedance_int = np.interp(log_time, theo_log_time, theo_impedance)
         diff_val = optu.weighted_diff(log_time, theo_impedance_int, impedance)
         # You may also compute diffloglog if needed.
         return diff_val
 
+    def to_minimize_imp_batch(
+        self,
+        population,
+        theo_log_time,
+        impedance,
+        log_time,
+        global_weight,
+        N,
+        theo_delta,
+    ):
+        # to_minimize_imp for every row of population, evaluated in batches
+        # of at most opt_batch_size networks
+        batch_size = self.parameters.get(
+            "opt_batch_size", dbase.std_eval_defaults["opt_batch_size"]
+        )
+        population = np.atleast_2d(population)
+        if self.forward_model == "poles":
+            # every network needs its own eigen-solve, there is nothing to batch
+            return np.array(
+                [
+                    self.to_minimize_imp(
+                        arguments,
+                        theo_log_time,
+                        impedance,
+                        log_time,
+                        global_weight,
+                        N,
+                        theo_delta,
+                    )
+                    for arguments in population
+                ]
+            )
+
+        diff_vals = np.empty(len(population))
+
+        for first in range(0, len(population), batch_size):
+            batch = population[first : first + batch_size]
+            opt_res = self.sort_and_lim_diff_batch(batch[:, :N])
+            opt_cap = self.sort_and_lim_diff_batch(np.exp(batch[:, N:]))
+            theo_time_const = self.struc_to_time_const_batch(
+                theo_log_time, theo_delta, opt_res, opt_cap
+            )
+            theo_imp_deriv, theo_impedance = utl.time_const_to_imp_batch(
+                theo_log_time, theo_time_const
+            )
+            theo_impedance_int = optu.interp_batch(
+                log_time, theo_log_time, theo_impedance
+            )
+            diff_vals[first : first + batch_size] = optu.weighted_diff_batch(
+                log_time, theo_impedance_int, impedance
+            )
+
+        return diff_vals
+
+    def ordering_constraint(self, N, bounds_r, bounds_c):
+        # ascending cumulative resistances and log capacities, first and last
+        # value of both halves within their bounds
+        matrix = np.zeros((2 * N + 2, 2 * N))
+        lower = np.zeros(2 * N + 2)
+        upper = np.full(2 * N + 2, np.inf)
+
+        for i in range(N - 1):
+            for offset, row in [(0, i), (N, N - 1 + i)]:
+                matrix[row, offset + i] = -1.0
+                matrix[row, offset + i + 1] = 1.0
+
+        row = 2 * N - 2
+        for index, lower_val, upper_val in [
+            (0, bounds_r[0], np.inf),
+            (N - 1, -np.inf, bounds_r[1]),
+            (N, bounds_c[0], np.inf),
+            (2 * N - 1, -np.inf, bounds_c[1]),
+        ]:
+            matrix[row, index] = 1.0
+            lower[row] = lower_val
+            upper[row] = upper_val
+            row += 1
+
+        return opt.LinearConstraint(matrix, lower, upper)
+
+    def to_minimize_imp_grad(
+        self,
+        arguments,
+        theo_log_time,
+        impedance,
+        log_time,
+        global_weight,
+        N,
+        theo_delta,
+    ):
+        # to_minimize_imp and its analytic gradient, for jac=True in scipy.optimize.minimize
+        cap_args = np.exp(arguments[N:])
+        opt_res = self.sort_and_lim_diff(arguments[:N])
+        opt_cap = self.sort_and_lim_diff(cap_args)
+
+        if self.forward_model == "poles":
+            ladder = self.ladder_poles(opt_res, opt_cap)
+            log_tau, pole_res = self.ladder_to_poles(ladder)
+            theo_imp_deriv, theo_impedance = eng.pole_impedance(
+                theo_log_time, log_tau, pole_res
+            )
+        else:
+            loads = self.ladder_impedances(theo_log_time, theo_delta, opt_res, opt_cap)
+            time_const_factor = (theo_log_time[1] - theo_log_time[0]) / np.pi
+            theo_time_const = loads[0].imag * time_const_factor
+
+            theo_imp_deriv, theo_impedance = self.time_const_to_imp(
+                theo_log_time, theo_time_const
+            )
+        theo_impedance_int = np.interp(log_time, theo_log_time, theo_impedance)
+        diff_val, grad_imp_int = optu.weighted_diff_grad(
+            log_time, theo_impedance_int, impedance
+        )
+
+        # adjoint pass: interpolation, impedance integral, ladder, parametrisation
+        grad_imp = optu.interp_adjoint(log_time, theo_log_time, grad_imp_int)
+        if self.forward_model == "poles":
+            grad_log_tau, grad_pole_res = eng.pole_impedance_adjoint(
+                theo_log_time, log_tau, pole_res, grad_imp
+            )
+            grad_res, grad_cap = self.ladder_poles_grad(
+                ladder, grad_log_tau, grad_pole_res
+            )
+        else:
+            grad_time_const = utl.time_const_to_imp_adjoint(theo_log_time, grad_imp)
+            grad_res, grad_cap = self.ladder_grad(
+                loads, opt_res, opt_cap, grad_time_const * time_const_factor
+            )
+
+        grad = np.concatenate(
+            [
+                self.sort_and_lim_diff_grad(arguments[:N], grad_res),
+                self.sort_and_lim_diff_grad(cap_args, grad_cap) * cap_args,
+            ]
+        )
+        return diff_val, grad
+
     def optimize_to_imp(
         self,
         res_init,
@@ -206,12 +684,18 @@ class TransientOptimizer:
         global_weight,
         theo_delta,
         opt_method="COBYLA",
+        reduced_grid=None,
     ):
+        if reduced_grid is None:
+            reduced_grid = self.parameters.get(
+                "opt_reduced_grid", dbase.std_eval_defaults["opt_reduced_grid"]
+            )
+        if reduced_grid or self.forward_model == "poles":
+            theo_log_time = self.reduced_log_time(theo_log_time, log_time, theo_delta)
+            logger.info(f"Optimizing on a reduced grid of {theo_log_time.size} points")
+
         # Set the complex_time based on theo_delta and theo_log_time
-        self.complex_time = -complex(
-            math.cos(theo_delta), math.sin(theo_delta)
-        ) * np.exp(-theo_log_time)
-        self.delta_in_global_complex_time = theo_delta
+        self.set_complex_time(theo_log_time, theo_delta)
         N = len(res_init)
         cap_init_log = np.log(cap_init)
         cap_min = np.amin(cap_init_log)
@@ -254,6 +738,17 @@ class TransientOptimizer:
             )
             self.eval_count += 1
 
+            if self.checkpoint_hook is not None:
+                best = np.argmin(self.results_obj)
+                self.checkpoint_hook(
+                    self.results_res[best],
+                    self.results_cap[best],
+                    self.results_obj[best],
+                )
+
+        # the initial network is a candidate too, so a warm start is never made worse
+        callbackF(init_vect)
+
         if opt_method == "Powell":
             logger.info("Employing optimization method: Powell")
             opt_result = opt.minimize(
@@ -267,34 +762,98 @@ class TransientOptimizer:
             )
         elif opt_method == "COBYLA":
             logger.info("Employing optimization method: COBYLA")
-            rl = bounds_r[0][0]
-            ru = bounds_r[0][1]
-            cl = bounds_c[0][0]
-            cu = bounds_c[0][1]
-            cons = []
-            cons.append({"type": "ineq", "fun": lambda x, lb=rl: x[0] - lb})
-            cons.append({"type": "ineq", "fun": lambda x, ub=ru, num=N: ub - x[N - 1]})
-            cons.append({"type": "ineq", "fun": lambda x, lb=cl, num=N: x[N] - lb})
-            cons.append({"type": "ineq", "fun": lambda x, ub=cu: ub - x[-1]})
-            for factor in range(N - 1):
-                cons.append(
-                    {"type": "ineq", "fun": lambda x, i=factor: x[i + 1] - x[i]}
-                )
-                cons.append(
-                    {
-                        "type": "ineq",
-                        "fun": lambda x, i=factor, num=N: x[i + 1 + num] - x[i + num],
-                    }
-                )
             opt_result = opt.minimize(
                 self.to_minimize_imp,
                 init_vect,
                 args=(theo_log_time, impedance, log_time, global_weight, N, theo_delta),
                 method="COBYLA",
-                constraints=cons,
+                constraints=self.ordering_constraint(N, bounds_r[0], bounds_c[0]),
                 tol=0.0001,
                 options={"maxiter": 10000, "disp": True, "catol": 1},
             )
+        elif opt_method == "L-BFGS-B":
+            # the objective sorts the parameters itself, so box bounds are sufficient
+            logger.info("Employing optimization method: L-BFGS-B")
+            opt_result = opt.minimize(
+                self.to_minimize_imp_grad,
+                init_vect,
+                args=(theo_log_time, impedance, log_time, global_weight, N, theo_delta),
+                jac=True,
+                callback=callbackF,
+                method="L-BFGS-B",
+                bounds=bounds_r * N + bounds_c * N,
+                options={"maxiter": N * 100, "ftol": 1e-10},
+            )
+        elif opt_method == "SLSQP":
+            logger.info("Employing optimization method: SLSQP")
+            opt_result = opt.minimize(
+                self.to_minimize_imp_grad,
+                init_vect,
+                args=(theo_log_time, impedance, log_time, global_weight, N, theo_delta),
+                jac=True,
+                callback=callbackF,
+                method="SLSQP",
+                bounds=bounds_r * N + bounds_c * N,
+                constraints=self.ordering_constraint(N, bounds_r[0], bounds_c[0]),
+                options={"maxiter": N * 100, "ftol": 1e-10},
+            )
+        elif opt_method == "trust-constr":
+            logger.info("Employing optimization method: trust-constr")
+            opt_result = opt.minimize(
+                self.to_minimize_imp_grad,
+                init_vect,
+                args=(theo_log_time, impedance, log_time, global_weight, N, theo_delta),
+                jac=True,
+                method="trust-constr",
+                bounds=bounds_r * N + bounds_c * N,
+                constraints=self.ordering_constraint(N, bounds_r[0], bounds_c[0]),
+                options={"maxiter": N * 100, "gtol": 1e-8, "xtol": 1e-10},
+            )
+        elif opt_method == "differential_evolution":
+            # the whole population of a generation is evaluated in one batched call,
+            # the best member is refined with the analytic gradient
+            logger.info("Employing optimization method: differential_evolution")
+            bounds = bounds_r * N + bounds_c * N
+            de_result = opt.differential_evolution(
+                lambda population: self.to_minimize_imp_batch(
+                    population.T,
+                    theo_log_time,
+                    impedance,
+                    log_time,
+                    global_weight,
+                    N,
+                    theo_delta,
+                ),
+                bounds,
+                maxiter=self.parameters.get(
+                    "opt_max_generations",
+                    dbase.std_eval_defaults["opt_max_generations"],
+                ),
+                popsize=self.parameters.get(
+                    "opt_population_size",
+                    dbase.std_eval_defaults["opt_population_size"],
+                ),
+                seed=self.parameters.get("random_seed"),
+                callback=lambda arguments, convergence: callbackF(arguments),
+                polish=False,
+                x0=init_vect,
+                updating="deferred",
+                vectorized=True,
+            )
+            logger.info(
+                f"Differential evolution: {de_result.nit} generations, "
+                f"objective {de_result.fun:.4f}, polishing with L-BFGS-B"
+            )
+            opt_result = opt.minimize(
+                self.to_minimize_imp_grad,
+                de_result.x,
+                args=(theo_log_time, impedance, log_time, global_weight, N, theo_delta),
+                jac=True,
+                callback=callbackF,
+                method="L-BFGS-B",
+                bounds=bounds,
+                options={"maxiter": N * 100, "ftol": 1e-10},
+            )
         else:
             logger.error(f"Unknown optimization method: {opt_method}")
             return None
@@ -317,7 +876,117 @@ class TransientOptimizer:
         self.results_res = np.reshape(np.array(self.results_res), (-1, N))
         self.results_cap = np.reshape(np.array(self.results_cap), (-1, N))
         min_idx = np.argmin(self.results_obj)
+        logger.info(
+            f"Rung impedance cache: {self.rung_cache.hits} hits, "
+            f"{self.rung_cache.misses} misses, hit rate {self.rung_cache.hit_rate:.1%}, "
+            f"{self.rung_cache.nbytes / 1e6:.1f} MB in {len(self.rung_cache.entries)} entries"
+        )
         return self.results_res[min_idx], self.results_cap[min_idx], opt_result
 
+    def fidelity_stages(self, N, theo_delta):
+        # layer count, rotation angle and reduced grid flag of every stage, coarsest first;
+        # every coarser level halves the layers and doubles the angle, which smooths the
+        # spectrum so that the reduced grid of the stage can be coarser as well
+        n_stages = self.parameters.get(
+            "opt_fidelity_stages", dbase.std_eval_defaults["opt_fidelity_stages"]
+        )
+        if not isinstance(n_stages, int) or n_stages < 1:
+            raise ValueError(
+                f"Parameter 'opt_fidelity_stages' must be a positive integer, got {n_stages}"
+            )
+
+        stages = []
+        for level in range(n_stages - 1, -1, -1):
+            if level == 0:
+                stages.append((N, theo_delta, None))
+            else:
+                stages.append(
+                    (
+                        min(N, max(2, math.ceil(N / 2**level))),
+                        min(theo_delta * 2**level, np.pi / 8),
+                        True,
+                    )
+                )
+        return stages
+
+    def promote_network(self, res, cap, N):
+        # change the layer count of a network given by cumulative resistances and
+        # capacities: fewer layers merge neighbouring sections, more layers split the
+        # sections with the largest resistance into equal parts, which leaves the
+        # impedance of the ladder unchanged
+        n = len(res)
+        if N == n:
+            return res, cap
+
+        if N < n:
+            index = np.round(np.linspace(0, n, N + 1)[1:]).astype(int) - 1
+            return res[index], cap[index]
+
+        res_diff = np.diff(res, prepend=0.0)
+        cap_diff = np.diff(cap, prepend=0.0)
+        pieces = np.ones(n, dtype=int)
+        for _ in range(N - n):
+            pieces[np.argmax(res_diff / pieces)] += 1
+
+        return (
+            np.cumsum(np.repeat(res_diff / pieces, pieces)),
+            np.cumsum(np.repeat(cap_diff / pieces, pieces)),
+        )
+
+    def optimize_to_imp_schedule(
+        self,
+        res_init,
+        cap_init,
+        theo_log_time,
+        impedance,
+        log_time,
+        global_weight,
+        theo_delta,
+        opt_method="COBYLA",
+    ):
+        # optimize_to_imp over the stages of fidelity_stages, every stage starts
+        # from the promoted result of the previous one
+        stages = self.fidelity_stages(len(res_init), theo_delta)
+        if len(stages) == 1:
+            return self.optimize_to_imp(
+                res_init,
+                cap_init,
+                theo_log_time,
+                impedance,
+                log_time,
+                global_weight,
+                theo_delta,
+                opt_method,
+            )
+
+        res, cap = res_init, cap_init
+        for number, (layers, delta, reduced_grid) in enumerate(stages, 1):
+            res, cap = self.promote_network(res, cap, layers)
+            res, cap, opt_result = self.optimize_to_imp(
+                res,
+                cap,
+                theo_log_time,
+                impedance,
+                log_time,
+                global_weight,
+                delta,
+                opt_method,
+                reduced_grid=reduced_grid,
+            )
+            logger.info(
+                f"Fidelity stage {number}/{len(stages)}: {layers} layers, "
+                f"delta {delta:.4f}, objective {np.min(self.results_obj):.4f}, "
+                f"{self.eval_count} evaluations in total"
+            )
+
+        return res, cap, opt_result
+
     def time_const_to_imp(self, theo_log_time, time_const):
         return utl.time_const_to_imp(theo_log_time, time_const)
+
+
+def optimize_to_imp_worker(parameters, optimize_args):
+    # entry point for worker processes and threads of the multi-start optimization
+    opt_module = TransientOptimizer(parameters)
+    fin_res, fin_cap, opt_result = opt_module.optimize_to_imp_schedule(*optimize_args)
+    return fin_res, fin_cap, opt_result, np.min(opt_module.results_obj)
@@ -1,12 +1,17 @@
 import numpy as np
 import os
-import scipy.interpolate as ipl
 import scipy.optimize as spo
 import scipy.integrate as sin
 import logging
+import copy
+import time
+import threading
+import functools
+import multiprocessing
 
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from typing import Dict, List
-from itertools import zip_longest
+from itertools import chain, zip_longest
 
 from .utils import transient_utils as utl
 from .utils import optimizer_utils as optu
@@ -15,11 +20,54 @@ from . import transient_optimizer as trop
 from . import transient_defaults as dbase
 
 from .exporter.transient_io_manager import IOManager
+from .transient_library import StructureLibrary
 
-from .transient_core import StructureFunction
+from .transient_core import (
+    StructureFunction,
+    MPFR_STRUC_METHODS,
+    STRUC_METHODS,
+    cauer_transform_worker,
+)
 
 logger = logging.getLogger("PyRthLogger")
 
+# module attributes that hold the results of the completed bootstrap repetitions
+BOOT_RESULT_KEYS = [
+    "boot_results_imp",
+    "boot_results_deriv",
+    "boot_results_timeconst",
+    "boot_results_sum_timeconst",
+    "boot_results_struc_res",
+    "boot_results_struc_cap",
+    "boot_imp_time",
+    "boot_deriv_time",
+]
+
+# attributes of the standard and optimization modules collected by the bootstrap
+BOOT_MODULE_NAMES = {
+    "bootstrap_standard": {
+        "imp": "impedance",
+        "deriv": "imp_deriv_interp",
+        "timeconst": "time_spec",
+        "struc_res": "int_cau_res",
+        "struc_cap": "int_cau_cap",
+        "imp_time": "log_time",
+        "deriv_time": "log_time_pad",
+    },
+    "bootstrap_optimization": {
+        "imp": "theo_impedance",
+        "deriv": "theo_imp_deriv",
+        "timeconst": "theo_time_const",
+        "struc_res": "theo_int_cau_res",
+        "struc_cap": "theo_int_cau_cap",
+        "imp_time": "theo_log_time",
+        "deriv_time": "theo_log_time",
+    },
+}
+
+# evaluation of the current bootstrap worker, set by init_bootstrap_worker
+bootstrap_worker_state = threading.local()
+
 
 class Evaluation:
 
@@ -38,10 +86,52 @@ class Evaluation:
         self.modules: Dict[str, StructureFunction] = {}
         self.module_counters = {}
         self.io_manager = IOManager(self.modules)
+        # fin_res and fin_cap of the last optimization, seeds the next one with opt_warm_start
+        self.warm_start_network = None
+        # state loaded by resume, consumed by the module it was written by
+        self.resume_state = None
+        self.last_checkpoint = -np.inf
+        # structure libraries loaded from struc_library files, by path
+        self.structure_libraries = {}
 
         utl.numba_preloader()
         logger.info("Evaluation instance initialized.")
 
+    def resume(self, checkpoint_file: str):
+        """
+        Continue an interrupted bootstrap_module or optimization_module run from the
+        checkpoint_file it wrote. The parameters of the interrupted run are restored,
+        completed bootstrap repetitions are skipped and an optimization restarts from
+        the best network stored in the checkpoint.
+        """
+
+        state = utl.load_checkpoint(checkpoint_file)
+        if state.get("entry") not in ["bootstrap_module", "optimization_module"]:
+            raise ValueError(
+                f"File '{checkpoint_file}' is not a bootstrap_module or optimization_module checkpoint."
+            )
+
+        logger.info(f"Resuming {state['entry']} from checkpoint {checkpoint_file}")
+
+        self.resume_state = state
+        try:
+            return getattr(self, state["entry"])(state["parameters"])
+        finally:
+            self.resume_state = None
+
+    def _save_checkpoint(self, state, force=False):
+        # write state to checkpoint_file, at most once per checkpoint_interval
+        if (
+            not force
+            and time.monotonic() - self.last_checkpoint
+            < self.parameters["checkpoint_interval"]
+        ):
+            return
+
+        utl.save_checkpoint(self.parameters["checkpoint_file"], state)
+        self.last_checkpoint = time.monotonic()
+        logger.debug(f"Checkpoint written to {self.parameters['checkpoint_file']}")
+
     def save_as_csv(self):
         """
         Export all evaluation results to CSV files.
@@ -110,13 +200,117 @@ class Evaluation:
 
         self.parameters = dbase.validate_and_merge_defaults(parameters, self.parameters)
 
+        if isinstance(self.parameters["struc_method"], (list, tuple)):
+            modules = self._multi_method_module()
+
+            for module in modules:
+                self._add_module_to_eval_dict(module)
+
+            return modules
+
         module = self._standard_module()
         self._add_module_to_eval_dict(module)
 
         return module
 
+    def _executor_class(self):
+        # executor for n_workers > 1, after checking the parallel settings
+        if (
+            not isinstance(self.parameters["n_workers"], int)
+            or self.parameters["n_workers"] < 1
+        ):
+            raise ValueError(
+                f"Parameter 'n_workers' must be a positive integer, got {self.parameters['n_workers']}"
+            )
+        if self.parameters["parallel_backend"] not in ["process", "thread"]:
+            raise ValueError(
+                f"Parameter 'parallel_backend' must be 'process' or 'thread', got {self.parameters['parallel_backend']}"
+            )
+
+        if self.parameters["parallel_backend"] == "thread":
+            return ThreadPoolExecutor
+        # the parallel numba kernels start a threading layer that does not survive
+        # a fork, the worker processes are therefore started from a fresh server
+        if "forkserver" in multiprocessing.get_all_start_methods():
+            return functools.partial(
+                ProcessPoolExecutor,
+                mp_context=multiprocessing.get_context("forkserver"),
+            )
+        return ProcessPoolExecutor
+
+    def _multi_method_module(self):
+        methods = list(self.parameters["struc_method"])
+        base_label = self.parameters["label"]
+
+        for method in methods:
+            if method not in STRUC_METHODS:
+                raise ValueError(
+                    f"Parameter 'struc_method' must only contain {STRUC_METHODS}, got {method}"
+                )
+        if len(set(methods)) != len(methods):
+            raise ValueError(
+                f"Parameter 'struc_method' must not contain duplicates, got {methods}"
+            )
+        if self.parameters["only_make_z"] or not self.parameters["calc_struc"]:
+            raise ValueError(
+                "A list of struc_method values requires 'calc_struc' True and 'only_make_z' False."
+            )
+        executor_class = self._executor_class()
+
+        # impedance, spectrum and foster network are shared by all methods
+        org_parameters = self.parameters.copy()
+        self.parameters["struc_method"] = methods[0]
+        self.parameters["calc_struc"] = False
+        try:
+            base_module = self._standard_module()
+        finally:
+            self.parameters = org_parameters
+
+        base_module.calc_struc = True
+
+        if any(method in MPFR_STRUC_METHODS for method in methods):
+            base_module.mpfr_foster_impedance()
+
+        modules = []
+        for method in methods:
+            module = copy.copy(base_module)
+            module.struc_method = method
+            module.label = f"{base_label}_{method}"
+            module.data_handlers = set(base_module.data_handlers)
+            if method in MPFR_STRUC_METHODS:
+                # poly_long_div works on the coefficient lists in place
+                module.mpfr_z_num = list(base_module.mpfr_z_num)
+                module.mpfr_z_denom = list(base_module.mpfr_z_denom)
+            modules.append(module)
+
+        logger.info(f"Calculating structure functions using {', '.join(methods)}")
+
+        n_workers = min(base_module.n_workers, len(modules))
+        if n_workers > 1:
+            # every module works in its own gmpy2 context, so threads are safe as well
+            with executor_class(max_workers=n_workers) as executor:
+                results = list(executor.map(cauer_transform_worker, modules))
+        else:
+            results = [cauer_transform_worker(module) for module in modules]
+
+        for module, result in zip(modules, results):
+            for key, value in result.items():
+                setattr(module, key, value)
+            module.apply_memory_policy()
+            module.data_handlers.add("structure")
+            logger.info(
+                f"Total resistance ({module.struc_method}): {module.int_cau_res[-1]:.2f} K/W"
+            )
+
+        return modules
+
     def _standard_module(self):
 
+        if isinstance(self.parameters["struc_method"], (list, tuple)):
+            raise ValueError(
+                "A list of struc_method values is only supported by standard_module."
+            )
+
         module: StructureFunction = StructureFunction(self.parameters)
 
         # Ensure required parameters are set in the module
@@ -173,22 +367,18 @@ class Evaluation:
 
             module.foster_network()
 
+            if module.foster_reduction_tol is not None:
+                module.reduce_foster_network()
+
             if module.calc_struc:
                 logger.info(
                     f"Calculating structure function using {module.struc_method}"
                 )
 
-                if module.struc_method == "polylong":
+                if module.struc_method in MPFR_STRUC_METHODS:
                     module.mpfr_foster_impedance()
-                    module.poly_long_div()
-                elif module.struc_method in ["khatwani", "sobhy"]:
-                    module.mpfr_foster_impedance()
-                    module.j_fraction_methods()
-                elif module.struc_method == "boor_golub":
-                    module.mpfr_foster_impedance()
-                    module.boor_golub()
-                elif module.struc_method == "lanczos":
-                    module.lanczos()
+                module.cauer_transform()
+                module.apply_memory_policy()
 
                 # Add structure handler after any structure calculation
                 module.data_handlers.add("structure")
@@ -269,16 +459,13 @@ class Evaluation:
         ]
 
         org_parameters = self.parameters.copy()
-        modules_list = []
+        self.warm_start_network = None
 
-        self.set_length = 0
-
-        # Lazy iteration using zip (since all iterators have equal length)
+        # parameters of every member of the set, labelled by the first keyword and counter
+        set_parameters = []
         for counter, values in enumerate(zip(*iterators)):
-            # Update parameters with the current set of values.
             modified_parameters = org_parameters.copy()
 
-            # Use simpler label suffix: first keyword + counter
             if iterable_keywords:
                 first_keyword = iterable_keywords[0]
                 label_suffix = f"{first_keyword}_{counter}"
@@ -290,38 +477,82 @@ class Evaluation:
             for keyword, value in zip(iterable_keywords, values):
                 modified_parameters[keyword] = value
 
-            # Merge defaults.
-            self.parameters = dbase.validate_and_merge_defaults(
-                modified_parameters, self.parameters
+            set_parameters.append(
+                dbase.validate_and_merge_defaults(modified_parameters, org_parameters)
             )
 
-            # Create module using the appropriate evaluation type.
-            if evaluation_type == "standard":
-                module = self._standard_module()
-            elif evaluation_type == "optimization":
-                module = self._optimization_module()
-            elif evaluation_type in ["bootstrap_standard", "bootstrap_optimization"]:
-                module = self._bootstrap_module()
-            else:
-                raise ValueError(
-                    "Invalid evaluation_type. Choose either 'standard', 'optimization', or 'bootstrap_standard' or 'bootstrap_optimization'."
+        executor_class = self._executor_class()
+        n_workers = min(org_parameters["n_workers"], len(set_parameters))
+        if n_workers > 1 and org_parameters["opt_warm_start"]:
+            # every member starts from the result of the previous one
+            logger.warning("opt_warm_start evaluates the module set serially")
+            n_workers = 1
+
+        modules_list = []
+        self.set_length = 0
+
+        if n_workers > 1:
+            if org_parameters["normalize_impedance_to_previous"] and not hasattr(
+                self, "stored_early_zth"
+            ):
+                # the first module provides the early impedance the others are normalized to
+                self.parameters = set_parameters[0]
+                modules_list.append(self._module_set_member(evaluation_type))
+                self.set_length += 1
+
+            # workers evaluate their module serially, results keep the order of the set
+            worker_parameters = [
+                {**parameters, "n_workers": 1}
+                for parameters in set_parameters[self.set_length :]
+            ]
+            stored_early_zth = getattr(self, "stored_early_zth", None)
+
+            logger.info(
+                f"Evaluating {len(worker_parameters)} modules in {n_workers} workers"
+            )
+            with executor_class(max_workers=n_workers) as executor:
+                modules_list.extend(
+                    executor.map(
+                        module_set_worker,
+                        [evaluation_type] * len(worker_parameters),
+                        worker_parameters,
+                        [stored_early_zth] * len(worker_parameters),
+                    )
                 )
-            modules_list.append(module)
-            self.set_length += 1
+            self.set_length = len(modules_list)
+            self.parameters = set_parameters[-1]
+        else:
+            for parameters in set_parameters:
+                self.parameters = parameters
+                modules_list.append(self._module_set_member(evaluation_type))
+                self.set_length += 1
 
         return modules_list
 
+    def _module_set_member(self, evaluation_type):
+        # Create module using the appropriate evaluation type.
+        if evaluation_type == "standard":
+            return self._standard_module()
+        elif evaluation_type == "optimization":
+            return self._optimization_module()
+        elif evaluation_type in ["bootstrap_standard", "bootstrap_optimization"]:
+            return self._bootstrap_module()
+        raise ValueError(
+            "Invalid evaluation_type. Choose either 'standard', 'optimization', or 'bootstrap_standard' or 'bootstrap_optimization'."
+        )
+
     def bootstrap_module(self, parameters: Dict):
         """
         Bootstrap module for evaluation with specified parameters. The module is used to evaluate the impedance approximation using a structure function. The structure function is calculated from a given set of resistances and capacitances.
         """
 
         self.parameters = dbase.validate_and_merge_defaults(parameters, self.parameters)
-        module = self._bootstrap_module()
+        self.warm_start_network = None
+        module = self._bootstrap_module(checkpoint_parameters=self.parameters.copy())
         self._add_module_to_eval_dict(module)
         return module
 
-    def _bootstrap_module(self):
+    def _bootstrap_module(self, checkpoint_parameters=None):
 
         mode = self.parameters.pop("bootstrap_mode", "from_data")
 
@@ -336,25 +567,7 @@ class Evaluation:
                 "Structure function calculation must be enabled for bootstrapping."
             )
 
-        if self.parameters["evaluation_type"] == "bootstrap_optimization":
-            time_name = "theo_log_time"
-            imp_name = "theo_impedance"
-            deriv_name = "theo_imp_deriv"
-            deriv_time_name = "theo_log_time"
-            time_const_name = "theo_time_const"
-            int_cau_res_name = "theo_int_cau_res"
-            int_cau_cap_name = "theo_int_cau_cap"
-            boot_method = self._optimization_module
-        elif self.parameters["evaluation_type"] == "bootstrap_standard":
-            time_name = "log_time"
-            imp_name = "impedance"
-            deriv_name = "imp_deriv_interp"
-            deriv_time_name = "log_time_pad"
-            time_const_name = "time_spec"
-            int_cau_res_name = "int_cau_res"
-            int_cau_cap_name = "int_cau_cap"
-            boot_method = self._standard_module
-        else:
+        if self.parameters["evaluation_type"] not in BOOT_MODULE_NAMES:
             raise ValueError(
                 f"Invalid evaluation_type specified {self.parameters['evaluation_type']}. Must be 'bootstrap_standard' or 'bootstrap_optimization'."
             )
@@ -366,7 +579,10 @@ class Evaluation:
 
         elif mode == "from_data":
 
-            module = boot_method()
+            if self.parameters["evaluation_type"] == "bootstrap_optimization":
+                module = self._optimization_module()
+            else:
+                module = self._standard_module()
 
             module.hist, bin_edge = np.histogram(
                 module.impedance - module.imp_smooth_full, bins=30
@@ -387,85 +603,130 @@ class Evaluation:
 
         logger.info(f"Bootstrapping: {repetitions} times")
 
-        min_res = np.inf
-        max_res = -np.inf
-
-        # Set up the random number generator
-        seed = self.parameters.get("random_seed")
-        if seed is not None:
-            rng = np.random.default_rng(seed)
+        if mode == "from_theo":
+            noise = (module.theo_log_time, module.theo_impedance, var)
         else:
-            rng = np.random.default_rng()
+            self.parameters["expected_var"] = popt[1]
+            noise = (module.log_time, module.imp_smooth_full, abs(popt[1]))
 
-        for n in range(repetitions):
+        # every repetition draws from its own stream, independent of the worker count
+        seed_sequence = np.random.SeedSequence(self.parameters.get("random_seed"))
 
-            logger.info(f"Repetition {n + 1}")
-
-            if mode == "from_theo":
-                impedance = module.theo_impedance + rng.normal(
-                    0.0, var, len(module.theo_impedance)
-                )
-
-                self.parameters["data"] = np.column_stack(
-                    (np.exp(module.theo_log_time), impedance)
-                )
-
-            elif mode == "from_data":
-
-                self.parameters["expected_var"] = popt[1]
-                resampled_imp = module.imp_smooth_full + rng.normal(
-                    0.0, abs(popt[1]), len(module.imp_smooth_full)
-                )
+        checkpointing = (
+            checkpoint_parameters is not None
+            and self.parameters["checkpoint_file"] is not None
+        )
 
-                self.parameters["data"] = np.column_stack(
-                    (np.exp(module.log_time), resampled_imp)
+        start = 0
+        if checkpointing and self.resume_state is not None:
+            start = self.resume_state["completed"]
+            for key, value in self.resume_state["results"].items():
+                setattr(module, key, value)
+            seed_sequence = np.random.SeedSequence(self.resume_state["seed_entropy"])
+            if self.resume_state["stored_early_zth"] is not None:
+                self.stored_early_zth = self.resume_state["stored_early_zth"]
+            self.warm_start_network = self.resume_state["warm_start_network"]
+            logger.info(f"Resuming after {start} of {repetitions} repetitions")
+
+        repetition_seeds = seed_sequence.spawn(repetitions)[start:]
+
+        executor_class = self._executor_class()
+        n_workers = min(self.parameters["n_workers"], len(repetition_seeds))
+        if n_workers > 1 and self.parameters["opt_warm_start"]:
+            # every repetition starts from the result of the previous one
+            logger.warning("opt_warm_start runs the bootstrap repetitions serially")
+            n_workers = 1
+
+        if n_workers > 1:
+            first_results = []
+            if self.parameters["normalize_impedance_to_previous"] and not hasattr(
+                self, "stored_early_zth"
+            ):
+                # the first repetition provides the early impedance the others are normalized to
+                first_results.append(
+                    self._bootstrap_repetition(noise, repetition_seeds[0])
                 )
+                repetition_seeds = repetition_seeds[1:]
+
+            logger.info(f"Running the repetitions in {n_workers} workers")
+            # every worker holds one evaluation that runs its repetitions serially,
+            # the tasks only carry the seeds
+            executor = executor_class(
+                max_workers=n_workers,
+                initializer=init_bootstrap_worker,
+                initargs=(
+                    {**self.parameters, "n_workers": 1},
+                    noise,
+                    getattr(self, "stored_early_zth", None),
+                ),
+            )
+            boot_results = chain(
+                first_results,
+                executor.map(bootstrap_repetition_worker, repetition_seeds),
+            )
+        else:
+            executor = None
+            boot_results = (
+                self._bootstrap_repetition(noise, repetition_seed)
+                for repetition_seed in repetition_seeds
+            )
 
-            boot_module = boot_method()
-
-            if n == 0:
-                module.boot_results_imp = np.zeros(
-                    (repetitions, len(getattr(boot_module, imp_name)))
-                )
-                module.boot_results_deriv = np.zeros(
-                    (repetitions, len(getattr(boot_module, deriv_name)))
-                )
-                module.boot_results_timeconst = np.zeros(
-                    (repetitions, len(getattr(boot_module, time_const_name)))
-                )
-                module.boot_results_sum_timeconst = np.zeros(
-                    (repetitions, len(getattr(boot_module, time_const_name)))
+        try:
+            for n, boot_result in enumerate(boot_results, start=start):
+
+                logger.info(f"Repetition {n + 1}")
+
+                if n == 0:
+                    module.boot_results_imp = np.zeros(
+                        (repetitions, len(boot_result["imp"]))
+                    )
+                    module.boot_results_deriv = np.zeros(
+                        (repetitions, len(boot_result["deriv"]))
+                    )
+                    module.boot_results_timeconst = np.zeros(
+                        (repetitions, len(boot_result["timeconst"]))
+                    )
+                    module.boot_results_sum_timeconst = np.zeros(
+                        (repetitions, len(boot_result["timeconst"]))
+                    )
+                    module.boot_results_struc_res = [0] * repetitions
+                    module.boot_results_struc_cap = [0] * repetitions
+
+                    module.boot_imp_time = boot_result["imp_time"]
+                    module.boot_deriv_time = boot_result["deriv_time"]
+
+                module.boot_results_imp[n, :] = boot_result["imp"]
+                module.boot_results_deriv[n, :] = boot_result["deriv"]
+                module.boot_results_timeconst[n, :] = boot_result["timeconst"]
+                module.boot_results_sum_timeconst[n, :] = sin.cumulative_trapezoid(
+                    boot_result["timeconst"],
+                    x=boot_result["deriv_time"],
+                    initial=0.0,
                 )
-                module.boot_results_struc_res = [0] * repetitions
-                module.boot_results_struc_cap = [0] * repetitions
-
-            module.boot_results_imp[n, :] = getattr(boot_module, imp_name).flatten()
-            module.boot_results_deriv[n, :] = getattr(boot_module, deriv_name).flatten()
-            module.boot_results_timeconst[n, :] = getattr(
-                boot_module, time_const_name
-            ).flatten()
-            module.boot_results_sum_timeconst[n, :] = sin.cumulative_trapezoid(
-                getattr(boot_module, time_const_name).flatten(),
-                x=getattr(boot_module, deriv_time_name).flatten(),
-                initial=0.0,
-            )
-            module.boot_results_struc_res[n] = getattr(
-                boot_module, int_cau_res_name
-            ).flatten()
-            module.boot_results_struc_cap[n] = getattr(
-                boot_module, int_cau_cap_name
-            ).flatten()
-
-            current_min = module.boot_results_struc_res[n][0]
-            current_max = module.boot_results_struc_res[n][-1]
-            min_res = min(min_res, current_min)
-            max_res = max(max_res, current_max)
+                module.boot_results_struc_res[n] = boot_result["struc_res"]
+                module.boot_results_struc_cap[n] = boot_result["struc_cap"]
+
+                if checkpointing:
+                    self._save_checkpoint(
+                        {
+                            "entry": "bootstrap_module",
+                            "parameters": checkpoint_parameters,
+                            "completed": n + 1,
+                            "results": {
+                                key: getattr(module, key) for key in BOOT_RESULT_KEYS
+                            },
+                            "seed_entropy": seed_sequence.entropy,
+                            "stored_early_zth": getattr(self, "stored_early_zth", None),
+                            "warm_start_network": self.warm_start_network,
+                        },
+                        force=n + 1 == repetitions,
+                    )
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
 
         logger.info("Calculating confidence intervals")
 
-        module.boot_imp_time = getattr(boot_module, time_name).flatten()
-        module.boot_deriv_time = getattr(boot_module, deriv_time_name).flatten()
-
         module.boot_imp_av = np.median(module.boot_results_imp, axis=0)
         module.boot_imp_perc_u, module.boot_imp_perc_l = np.percentile(
             module.boot_results_imp, [10, 90], axis=0
@@ -488,46 +749,38 @@ class Evaluation:
             np.percentile(module.boot_results_sum_timeconst, [10, 90], axis=0)
         )
 
-        base_num_fine = int(1e5)
-
-        module.boot_struc_res_fine = np.linspace(
-            min_res, max_res, base_num_fine, endpoint=True
+        (
+            module.boot_struc_res_fine,
+            module.boot_struc_cap_av,
+            module.boot_struc_cap_perc_u,
+            module.boot_struc_cap_perc_l,
+        ) = utl.structure_function_bands(
+            module.boot_results_struc_res, module.boot_results_struc_cap, [10, 90]
         )
 
-        interp_func = [0] * repetitions
-        for n in range(repetitions):
-            interp_func[n] = ipl.interp1d(
-                module.boot_results_struc_res[n], module.boot_results_struc_cap[n]
-            )
-
-        module.boot_struc_cap_av = np.zeros(base_num_fine)
-        module.boot_struc_cap_perc_u = np.zeros(base_num_fine)
-        module.boot_struc_cap_perc_l = np.zeros(base_num_fine)
-
-        N_res = -1
-        for res in module.boot_struc_res_fine:
-            N_res += 1
-            N = 0
-            vals = [0.0] * repetitions
-            for m in range(repetitions):
-                if res > module.boot_results_struc_res[m][-1]:
-                    vals[N] = module.boot_results_struc_cap[m][-1]
-                    N += 1
-                elif (res >= module.boot_results_struc_res[m][0]) and (
-                    res <= module.boot_results_struc_res[m][-1]
-                ):
-                    vals[N] = interp_func[m](res)
-                    N += 1
-
-            module.boot_struc_cap_av[N_res] = np.median(vals[:N])
-            module.boot_struc_cap_perc_u[N_res], module.boot_struc_cap_perc_l[N_res] = (
-                np.percentile(vals[:N], [10, 90])
-            )
-
         module.data_handlers.add("boot")
 
         return module
 
+    def _bootstrap_repetition(self, noise, repetition_seed):
+        # evaluate one bootstrap repetition on the noisy impedance drawn from repetition_seed
+        log_time, impedance, sigma = noise
+        rng = np.random.default_rng(repetition_seed)
+
+        self.parameters["data"] = np.column_stack(
+            (np.exp(log_time), impedance + rng.normal(0.0, sigma, len(impedance)))
+        )
+
+        if self.parameters["evaluation_type"] == "bootstrap_optimization":
+            boot_module = self._optimization_module()
+        else:
+            boot_module = self._standard_module()
+
+        names = BOOT_MODULE_NAMES[self.parameters["evaluation_type"]]
+        return {
+            key: getattr(boot_module, name).flatten() for key, name in names.items()
+        }
+
     def optimization_module(self, parameters: dict):
         """
         Optimizes the impedance approximation using a structure function. The structure function is calculated from a given set of resistances and capacitances.
@@ -537,14 +790,31 @@ class Evaluation:
             raise TypeError("Parameters must be provided as a dictionary.")
 
         self.parameters = dbase.validate_and_merge_defaults(parameters, self.parameters)
+        self.warm_start_network = None
+        if self.resume_state is not None:
+            self.warm_start_network = self.resume_state["network"]
 
-        module = self._optimization_module()
+        module = self._optimization_module(checkpoint_parameters=self.parameters.copy())
 
         self._add_module_to_eval_dict(module)
 
         return module
 
-    def _optimization_module(self):
+    def _structure_library(self):
+        library = self.parameters["struc_library"]
+        if library is None:
+            raise ValueError(
+                "Parameter 'struc_library' must be set when 'struc_init_method' is 'library'."
+            )
+        if isinstance(library, StructureLibrary):
+            return library
+
+        # loaded libraries are kept for the following modules of the evaluation
+        if library not in self.structure_libraries:
+            self.structure_libraries[library] = StructureLibrary.load(library)
+        return self.structure_libraries[library]
+
+    def _optimization_module(self, checkpoint_parameters=None):
 
         module = self._standard_module()
         module.theo_log_time = np.linspace(
@@ -555,6 +825,23 @@ class Evaluation:
 
         opt_module = trop.TransientOptimizer(self.parameters)
 
+        if (
+            checkpoint_parameters is not None
+            and self.parameters["checkpoint_file"] is not None
+        ):
+
+            def checkpoint_hook(res, cap, objective):
+                self._save_checkpoint(
+                    {
+                        "entry": "optimization_module",
+                        "parameters": checkpoint_parameters,
+                        "network": (res, cap),
+                        "objective": objective,
+                    }
+                )
+
+            opt_module.checkpoint_hook = checkpoint_hook
+
         logger.info("Optimizing impedance approximation")
 
         if module.opt_use_extrapolate == False:
@@ -574,7 +861,16 @@ class Evaluation:
         module.cau_cap_opt = module.int_cau_cap
 
         N = self.parameters["opt_model_layers"]
-        if self.parameters["struc_init_method"] == "optimal_fit":
+        if self.warm_start_network is not None:
+            # previous or checkpointed solution as initial network, split or merged to N layers
+            logger.info("Warm-starting from a previous optimization result")
+            module.init_opt_imp_res, module.init_opt_imp_cap = (
+                opt_module.promote_network(*self.warm_start_network, N)
+            )
+            module.init_opt_struc_res = module.init_opt_imp_res
+            module.init_opt_struc_cap = module.init_opt_imp_cap
+
+        elif self.parameters["struc_init_method"] == "optimal_fit":
             logger.info("Optimizing structure function approximation")
 
             struc_marker, init_opt_result = opt_module.optimize_theo_struc(
@@ -592,7 +888,19 @@ class Evaluation:
                 f"Message: {init_opt_result.message}, Success: {init_opt_result.success}"
             )
 
-        if self.parameters["struc_init_method"] == "x_sampling":
+        elif self.parameters["struc_init_method"] == "library":
+            library = self._structure_library()
+            index, distance = library.nearest(module.opt_log_time, module.opt_imp)
+            logger.info(
+                f"Starting from library network '{library.labels[index[0]]}', rms distance {distance[0]:.4g}"
+            )
+            module.init_opt_imp_res, module.init_opt_imp_cap = (
+                opt_module.promote_network(*library.networks[index[0]], N)
+            )
+            module.init_opt_struc_res = module.init_opt_imp_res
+            module.init_opt_struc_cap = module.init_opt_imp_cap
+
+        elif self.parameters["struc_init_method"] == "x_sampling":
 
             module.init_opt_imp_res, module.init_opt_imp_cap = (
                 opt_module.struc_x_sample(module.cau_res_opt, module.cau_cap_opt, N)
@@ -614,21 +922,17 @@ class Evaluation:
 
         global_weight = global_weight / np.average(global_weight)
 
-        module.fin_res, module.fin_cap, opt_result = opt_module.optimize_to_imp(
-            module.init_opt_imp_res,
-            module.init_opt_imp_cap,
-            module.theo_log_time,
-            module.opt_imp,
-            module.opt_log_time,
-            global_weight,
-            self.parameters["theo_delta"],
-            self.parameters["opt_method"],
+        module.fin_res, module.fin_cap, opt_result = self._optimize_to_imp(
+            opt_module, module, global_weight
         )
 
         logger.info(
             f"Optimization done. Message: {opt_result.message}, Success: {opt_result.success}"
         )
 
+        if self.parameters["opt_warm_start"]:
+            self.warm_start_network = (module.fin_res, module.fin_cap)
+
         module.fin_res_diff = opt_module.sort_and_lim_diff(module.fin_res)
         module.fin_cap_diff = opt_module.sort_and_lim_diff(module.fin_cap)
 
@@ -638,37 +942,32 @@ class Evaluation:
             )
         )
 
-        module.theo_diff_struc = np.zeros(len(module.theo_int_cau_res) - 1)
-        for i in range(len(module.theo_int_cau_res) - 1):
-            if not (module.theo_int_cau_res[i] - module.theo_int_cau_res[i + 1]) == 0.0:
-                module.theo_diff_struc[i] = (
-                    module.theo_int_cau_cap[i] - module.theo_int_cau_cap[i + 1]
-                ) / (module.theo_int_cau_res[i] - module.theo_int_cau_res[i + 1])
+        module.theo_diff_struc = utl.diff_structure_function(
+            module.theo_int_cau_res, module.theo_int_cau_cap
+        )
 
-        module.theo_time_const = opt_module.struc_to_time_const(
+        (
+            module.theo_time_const,
+            module.theo_imp_deriv,
+            module.theo_impedance,
+        ) = opt_module.network_response(
             module.theo_log_time,
             self.parameters["theo_delta"],
             module.fin_res_diff,
             module.fin_cap_diff,
         )
 
-        module.theo_imp_deriv, module.theo_impedance = opt_module.time_const_to_imp(
-            module.theo_log_time, module.theo_time_const
-        )
-
-        module.init_theo_time_const = opt_module.struc_to_time_const(
+        (
+            module.init_theo_time_const,
+            module.init_theo_imp_deriv,
+            module.init_theo_impedance,
+        ) = opt_module.network_response(
             module.theo_log_time,
             self.parameters["theo_delta"],
             module.init_opt_imp_res_diff,
             module.init_opt_imp_cap_diff,
         )
 
-        module.init_theo_imp_deriv, module.init_theo_impedance = (
-            opt_module.time_const_to_imp(
-                module.theo_log_time, module.init_theo_time_const
-            )
-        )
-
         module.back_imp_deriv, module.back_imp = opt_module.time_const_to_imp(
             module.log_time_pad, module.time_spec
         )
@@ -699,6 +998,122 @@ class Evaluation:
 
         return module
 
+    def _optimize_to_imp(self, opt_module, module, global_weight):
+        optimize_args = (
+            module.theo_log_time,
+            module.opt_imp,
+            module.opt_log_time,
+            global_weight,
+            self.parameters["theo_delta"],
+            self.parameters["opt_method"],
+        )
+
+        n_starts = self.parameters["opt_multi_start"]
+        if not isinstance(n_starts, int) or n_starts < 1:
+            raise ValueError(
+                f"Parameter 'opt_multi_start' must be a positive integer, got {n_starts}"
+            )
+
+        if n_starts == 1:
+            return opt_module.optimize_to_imp_schedule(
+                module.init_opt_imp_res, module.init_opt_imp_cap, *optimize_args
+            )
+
+        # the unperturbed initial network plus randomly scaled copies of it
+        rng = np.random.default_rng(self.parameters["random_seed"])
+        spread = self.parameters["opt_multi_start_spread"]
+        N = len(module.init_opt_imp_res)
+        starts = [(module.init_opt_imp_res, module.init_opt_imp_cap)]
+        for _ in range(n_starts - 1):
+            starts.append(
+                (
+                    np.sort(
+                        module.init_opt_imp_res * np.exp(spread * rng.normal(size=N))
+                    ),
+                    np.sort(
+                        module.init_opt_imp_cap * np.exp(spread * rng.normal(size=N))
+                    ),
+                )
+            )
+
+        def starts_agree(results):
+            # enough starts ended within the tolerance of the best objective
+            objectives = np.array([result[3] for result in results])
+            best = np.min(objectives)
+            agreeing = np.sum(
+                objectives <= best + self.parameters["opt_multi_start_tol"] * abs(best)
+            )
+            return agreeing >= self.parameters["opt_multi_start_agree"]
+
+        logger.info(f"Multi-start optimization with {n_starts} starting networks")
+
+        # the checkpoint only follows the best network over all starts
+        checkpoint_hook = opt_module.checkpoint_hook
+        best_objective = np.inf
+
+        def add_result(result):
+            nonlocal best_objective
+            results.append(result)
+            if checkpoint_hook is not None and result[3] < best_objective:
+                checkpoint_hook(result[0], result[1], result[3])
+            best_objective = min(best_objective, result[3])
+
+        def best_start_hook(res, cap, objective):
+            if objective < best_objective:
+                checkpoint_hook(res, cap, objective)
+
+        results = []
+        executor_class = self._executor_class()
+        n_workers = min(self.parameters["n_workers"], n_starts)
+        if n_workers > 1:
+            # results are taken in start order, so the starts that are used and the
+            # best network do not depend on which worker finishes first
+            optimizer_parameters = {
+                key: self.parameters[key] for key in trop.OPTIMIZER_PARAMETERS
+            }
+            executor = executor_class(max_workers=n_workers)
+            try:
+                futures = [
+                    executor.submit(
+                        trop.optimize_to_imp_worker,
+                        optimizer_parameters,
+                        (res_init, cap_init, *optimize_args),
+                    )
+                    for res_init, cap_init in starts
+                ]
+                for future in futures:
+                    add_result(future.result())
+                    if starts_agree(results):
+                        break
+            finally:
+                # starts that are still running finish in the background unused
+                executor.shutdown(wait=False, cancel_futures=True)
+        else:
+            if checkpoint_hook is not None:
+                opt_module.checkpoint_hook = best_start_hook
+            try:
+                for res_init, cap_init in starts:
+                    fin_res, fin_cap, opt_result = opt_module.optimize_to_imp_schedule(
+                        res_init, cap_init, *optimize_args
+                    )
+                    add_result(
+                        (fin_res, fin_cap, opt_result, np.min(opt_module.results_obj))
+                    )
+                    if starts_agree(results):
+                        break
+            finally:
+                opt_module.checkpoint_hook = checkpoint_hook
+
+        module.multi_start_objectives = np.array([result[3] for result in results])
+        best = np.argmin(module.multi_start_objectives)
+
+        logger.info(
+            f"Multi-start optimization: {len(results)} of {n_starts} starts run, "
+            f"best objective {module.multi_start_objectives[best]:.4f}"
+        )
+
+        return results[best][:3]
+
     def theoretical_module(self, parameters: dict):
         """
         Calculates a thermal impedance from a structure function. The structure function is calculated from a given set of resistances and capacitances.
@@ -800,28 +1215,23 @@ class Evaluation:
         module.theo_int_cau_res = module.theo_int_cau_res[1:]
         module.theo_int_cau_cap = module.theo_int_cau_cap[1:]
 
-        module.theo_diff_struc = np.zeros(len(module.theo_int_cau_res) - 1)
-        for i in range(len(module.theo_int_cau_res) - 1):
-            if not (module.theo_int_cau_res[i] - module.theo_int_cau_res[i + 1]) == 0.0:
-                module.theo_diff_struc[i] = (
-                    module.theo_int_cau_cap[i] - module.theo_int_cau_cap[i + 1]
-                ) / (module.theo_int_cau_res[i] - module.theo_int_cau_res[i + 1])
+        module.theo_diff_struc = utl.diff_structure_function(
+            module.theo_int_cau_res, module.theo_int_cau_cap
+        )
 
-        logger.debug("Calculating theoretical time constant spectrum")
+        logger.debug("Calculating theoretical time constant spectrum and impedance")
 
-        module.theo_time_const = inv_module.struc_to_time_const(
+        (
+            module.theo_time_const,
+            module.theo_imp_deriv,
+            module.theo_impedance,
+        ) = inv_module.network_response(
             module.theo_log_time,
             module.theo_delta,
             module.theo_resistances,
             module.theo_capacitances,
         )
 
-        logger.debug("Calculating theoretical impedance")
-
-        module.theo_imp_deriv, module.theo_impedance = inv_module.time_const_to_imp(
-            module.theo_log_time, module.theo_time_const
-        )
-
         module.data_handlers.add("theo_structure")
         module.data_handlers.add("theo")
 
@@ -1023,3 +1433,29 @@ class Evaluation:
         self._add_module_to_eval_dict(module)
 
         return module
+
+
+def module_set_worker(evaluation_type, parameters, stored_early_zth=None):
+    # entry point for worker processes and threads of the module set
+    evaluation = Evaluation()
+    evaluation.parameters = parameters
+    if stored_early_zth is not None:
+        evaluation.stored_early_zth = stored_early_zth
+    return evaluation._module_set_member(evaluation_type)
+
+
+def init_bootstrap_worker(parameters, noise, stored_early_zth=None):
+    # initializer of the bootstrap worker processes and threads, one evaluation each
+    evaluation = Evaluation()
+    evaluation.parameters = parameters.copy()
+    if stored_early_zth is not None:
+        evaluation.stored_early_zth = stored_early_zth
+    bootstrap_worker_state.evaluation = evaluation
+    bootstrap_worker_state.noise = noise
+
+
+def bootstrap_repetition_worker(repetition_seed):
+    # entry point for worker processes and threads of the bootstrap repetitions
+    return bootstrap_worker_state.evaluation._bootstrap_repetition(
+        bootstrap_worker_state.noise, repetition_seed
+    )
@@ -14,6 +14,108 @@ def weighted_diff(x_vals, y_1, y_2):
     return np.sqrt(np.trapz((y_1 - y_2) ** 2, x=x_vals))
 
 
+def weighted_diff_grad(x_vals, y_1, y_2):
+    # weighted_diff and its gradient with respect to y_1
+    value = weighted_diff(x_vals, y_1, y_2)
+
+    trapz_weight = trapz_weights(x_vals)
+
+    if value == 0.0:
+        return value, np.zeros(x_vals.size)
+
+    return value, trapz_weight * (y_1 - y_2) / value
+
+
+def weighted_diff_batch(x_vals, y_1, y_2):
+    # weighted_diff for every row of y_1
+    return np.sqrt(np.trapz((y_1 - y_2) ** 2, x=x_vals, axis=-1))
+
+
+def interp_weights(x_vals, xp):
+    # left indices and fractions of the linear interpolation np.interp(x_vals, xp, fp)
+    index = np.clip(np.searchsorted(xp, x_vals, side="right") - 1, 0, xp.size - 2)
+    frac = np.clip((x_vals - xp[index]) / (xp[index + 1] - xp[index]), 0.0, 1.0)
+    return index, frac
+
+
+def interp_batch(x_vals, xp, fp):
+    # np.interp(x_vals, xp, row) for every row of fp
+    index, frac = interp_weights(x_vals, xp)
+    return fp[..., index] * (1.0 - frac) + fp[..., index + 1] * frac
+
+
+def trapz_weights(x_vals):
+    # weights w with np.trapz(y, x=x_vals) == np.dot(w, y)
+    weight = np.zeros(x_vals.size)
+    half_step = 0.5 * np.diff(x_vals)
+    weight[:-1] += half_step
+    weight[1:] += half_step
+    return weight
+
+
+def log_chord_errors(x_vals, log_y, weight):
+    # trapezoidal integral of the squared log error between exp(log_y) and its chord
+    # from point i to point j, for all pairs i < j; the chord is linear in y, as the
+    # cumulative capacity of a uniform ladder section, other pairs are infinite
+    y_vals = np.exp(log_y)
+    errors = np.full((x_vals.size, x_vals.size), np.inf)
+
+    for i in range(x_vals.size - 1):
+        x_seg = x_vals[i + 1 :]
+        # chords from i to every j (rows) evaluated at every point k <= j (columns)
+        frac = (x_seg[np.newaxis, :] - x_vals[i]) / (x_seg[:, np.newaxis] - x_vals[i])
+        chord = y_vals[i] + (y_vals[i + 1 :, np.newaxis] - y_vals[i]) * frac
+        in_segment = np.tri(x_seg.size, dtype=bool)
+        residual = np.where(
+            in_segment,
+            (np.log(chord, where=in_segment, out=np.ones_like(chord)) - log_y[i + 1 :])
+            ** 2
+            * weight[i + 1 :],
+            0.0,
+        )
+        errors[i, i + 1 :] = residual.sum(axis=1)
+
+    return errors
+
+
+def piecewise_linear_knots(x_vals, log_y, n_knots, n_candidates=300):
+    # indices of the n_knots points, first and last included, whose chords fit
+    # exp(log_y) with the smallest integrated squared log error; dynamic
+    # programming over n_candidates evenly spaced candidate points. A polyline
+    # needs both ends, so n_knots is clamped to at least 2
+    index = np.unique(
+        np.round(np.linspace(0, x_vals.size - 1, n_candidates)).astype(int)
+    )
+    n_knots = max(min(n_knots, index.size), 2)
+    errors = log_chord_errors(x_vals[index], log_y[index], trapz_weights(x_vals[index]))
+
+    # cost[j]: smallest error of a polyline from the first candidate to candidate j
+    cost = errors[0].copy()
+    previous = np.zeros((n_knots, index.size), dtype=int)
+    for k in range(2, n_knots):
+        total = cost[:, np.newaxis] + errors
+        previous[k] = np.argmin(total, axis=0)
+        cost = total[previous[k], np.arange(index.size)]
+
+    knots = [index.size - 1]
+    for k in range(n_knots - 1, 1, -1):
+        knots.append(previous[k][knots[-1]])
+    knots.append(0)
+
+    return index[knots[::-1]]
+
+
+def interp_adjoint(x_vals, xp, grad):
+    # transpose of the linear interpolation np.interp(x_vals, xp, fp) applied to grad
+    index, frac = interp_weights(x_vals, xp)
+
+    grad_fp = np.zeros(xp.size)
+    np.add.at(grad_fp, index, grad * (1.0 - frac))
+    np.add.at(grad_fp, index + 1, grad * frac)
+
+    return grad_fp
+
+
 def log_log_weighted_diff(x_vals, y_1, y_2):
     safe = (y_1 > 0) & (y_2 > 0)
     y1_filt = y_1[safe]
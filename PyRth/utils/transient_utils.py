@@ -1,13 +1,42 @@
 import numpy as np
+import os
+import pickle
+import functools
+import scipy.fft as sfft
 import scipy.interpolate as interp
 import numpy.polynomial.polynomial as poly
 import logging
 import time
 import numba
-from scipy.integrate import cumulative_trapezoid
 
 logger = logging.getLogger("PyRthLogger")
 
+# half width in log time of the kernel that maps time constants to the impedance derivative
+TIME_CONST_KERNEL_WIDTH = 7
+
+
+def save_checkpoint(path, state):
+    """
+    Pickle a checkpoint state to path. The file is written next to the target
+    and then renamed, so an interruption never leaves a truncated checkpoint.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "wb") as file:
+        pickle.dump(state, file)
+    os.replace(temp_path, path)
+
+
+def load_checkpoint(path):
+    """
+    Load a checkpoint state written by save_checkpoint.
+    """
+    with open(path, "rb") as file:
+        return pickle.load(file)
+
 
 def get_iterator(value):
     if callable(value):
@@ -79,24 +108,181 @@ def weight_z_int(x):
     return 1 - np.exp(-np.exp(x))
 
 
+def time_const_kernel(delta_t):
+    """
+    Kernels that map a time-constant distribution on a uniform log time grid
+    with step delta_t to the impedance derivative and to the impedance, and the
+    index of the origin of both.
+    """
+    log_time_weight = np.arange(
+        -TIME_CONST_KERNEL_WIDTH, TIME_CONST_KERNEL_WIDTH + delta_t, delta_t
+    )
+    weight = weight_z(log_time_weight)
+
+    return weight, weight_z_int(log_time_weight), np.argmax(weight)
+
+
+@functools.lru_cache(maxsize=32)
+def time_const_kernel_spectra(delta_t, size):
+    """
+    FFT length, kernel origin and length, and the real FFTs of the derivative
+    kernel, the impedance kernel and the reversed impedance kernel for a grid
+    of size points, cached per grid.
+    """
+    weight, weight_int, start = time_const_kernel(delta_t)
+    n_fft = sfft.next_fast_len(size + weight.size - 1, real=True)
+
+    spectra = sfft.rfft(np.stack([weight, weight_int, weight_int[::-1]]), n_fft)
+    spectra.flags.writeable = False
+
+    return n_fft, start, weight.size, spectra
+
+
 def time_const_to_imp(log_time, time_const):
     """
     Convert a discrete time-constant distribution to time-domain impedance.
-    Returns the derivative and the integrated impedance.
+    Returns the derivative and the impedance. Both are FFT convolutions with
+    the kernels weight_z and weight_z_int, time constants more than one kernel
+    width below a time point contribute their full value to the impedance.
+    Several distributions can be converted at once, one per row.
     """
-    delta_t = log_time[1] - log_time[0]
-    log_time_weight = np.arange(-7, 7 + delta_t, delta_t)
-    weight = weight_z(log_time_weight)
+    size = log_time.size
+    n_fft, start, kernel_size, spectra = time_const_kernel_spectra(
+        log_time[1] - log_time[0], size
+    )
 
-    imp_deriv_long = np.convolve(time_const, weight, mode="full")
-    start = np.argmax(weight)
-    fin = start + log_time.size
-    imp_deriv = imp_deriv_long[start:fin]
-    imp = cumulative_trapezoid(imp_deriv, log_time, initial=0.0)
+    spectrum = sfft.rfft(time_const, n_fft, axis=-1)
+    imp_deriv = sfft.irfft(spectrum * spectra[0], n_fft, axis=-1)[
+        ..., start : start + size
+    ]
+    imp = sfft.irfft(spectrum * spectra[1], n_fft, axis=-1)[..., start : start + size]
+
+    settled = kernel_size - start
+    if settled < size:
+        imp[..., settled:] += np.cumsum(time_const, axis=-1)[..., : size - settled]
 
     return imp_deriv, imp
 
 
+def time_const_to_imp_batch(log_time, time_const):
+    """
+    time_const_to_imp for several time-constant distributions, one per row.
+    """
+    return time_const_to_imp(log_time, time_const)
+
+
+def time_const_to_imp_adjoint(log_time, grad_imp):
+    """
+    Adjoint of time_const_to_imp: maps the gradient with respect to the
+    impedance to the gradient with respect to the time constants.
+    """
+    size = log_time.size
+    n_fft, start, kernel_size, spectra = time_const_kernel_spectra(
+        log_time[1] - log_time[0], size
+    )
+
+    # correlation with the impedance kernel
+    offset = kernel_size - 1 - start
+    grad_long = sfft.irfft(sfft.rfft(grad_imp, n_fft) * spectra[2], n_fft)
+    grad_time_const = grad_long[offset : offset + size]
+
+    # settled time constants see every later gradient entry
+    settled = kernel_size - start
+    if settled < size:
+        tail_sum = np.cumsum(grad_imp[::-1])[::-1]
+        grad_time_const[: size - settled] += tail_sum[settled:]
+
+    return grad_time_const
+
+
+def diff_structure_function(int_cau_res, int_cau_cap):
+    """
+    Differential structure function dC/dR between neighbouring points of the
+    cumulative structure function. Steps without a change in resistance are set to zero.
+    """
+    delta_res = np.diff(int_cau_res)
+    delta_cap = np.diff(int_cau_cap)
+
+    diff_struc = np.zeros(delta_res.size)
+    np.divide(delta_cap, delta_res, out=diff_struc, where=delta_res != 0.0)
+
+    return diff_struc
+
+
+def local_gradient(cau_res, cau_cap):
+    """Local thermal gradient R/C of the Cauer elements, NaN where C is zero."""
+    gradient = np.full(cau_res.size, np.nan)
+    np.divide(cau_res, cau_cap, out=gradient, where=cau_cap != 0.0)
+
+    return gradient
+
+
+def resample_structure_function(int_cau_res, int_cau_cap, points):
+    """
+    Resample the cumulative structure function to a uniform resistance grid.
+    Returns the grid, the interpolated cumulative capacity and its derivative.
+    """
+    if np.any(np.diff(int_cau_res) < 0.0):
+        raise ValueError(
+            "The cumulative structure function must be monotonic in the resistance for resampling, negative Cauer resistances were found."
+        )
+
+    grid_res = np.linspace(int_cau_res[0], int_cau_res[-1], points)
+    grid_cap = np.interp(grid_res, int_cau_res, int_cau_cap)
+    grid_diff = np.gradient(grid_cap, grid_res)
+
+    return grid_res, grid_cap, grid_diff
+
+
+def structure_function_bands(
+    struc_res, struc_cap, percentiles, max_points=100000, block_size=2**22
+):
+    """
+    Median and percentiles of the cumulative structure functions of several
+    bootstrap repetitions on a common uniform resistance grid. A repetition is
+    left out below its first resistance and keeps its last capacity beyond its
+    last resistance. The grid step is half the median resistance step of the
+    repetitions, with at most max_points points.
+    Returns the grid, the median and one band per percentile.
+    """
+    # np.interp needs ascending resistances, so every repetition is sorted first
+    orders = [np.argsort(res, kind="stable") for res in struc_res]
+    struc_res = [np.asarray(res)[order] for res, order in zip(struc_res, orders)]
+    struc_cap = [np.asarray(cap)[order] for cap, order in zip(struc_cap, orders)]
+
+    min_res = min(res[0] for res in struc_res)
+    max_res = max(res[-1] for res in struc_res)
+
+    steps = np.concatenate([np.diff(res) for res in struc_res])
+    steps = steps[steps > 0.0]
+    points = max(len(res) for res in struc_res)
+    if steps.size:
+        points = max(points, int(np.ceil(2.0 * (max_res - min_res) / np.median(steps))))
+    points = min(points, max_points)
+
+    grid_res = np.linspace(min_res, max_res, points, endpoint=True)
+    quantiles = [50, *percentiles]
+    bands = np.empty((len(quantiles), points))
+
+    # the grid is processed in blocks that bound the interpolated array to block_size values
+    width = max(1, block_size // len(struc_res))
+    values = np.empty((len(struc_res), min(width, points)))
+    for first in range(0, points, width):
+        grid = grid_res[first : first + width]
+        block = values[:, : grid.size]
+        for row, (res, cap) in enumerate(zip(struc_res, struc_cap)):
+            block[row] = np.interp(grid, res, cap, left=np.nan)
+
+        # nanpercentile only where a repetition starts above the grid point
+        missing = np.isnan(block).any(axis=0)
+        band = bands[:, first : first + grid.size]
+        band[:, ~missing] = np.percentile(block[:, ~missing], quantiles, axis=0)
+        if np.any(missing):
+            band[:, missing] = np.nanpercentile(block[:, missing], quantiles, axis=0)
+
+    return (grid_res, *bands)
+
+
 def gaussian(x):
     return np.exp(-x * x / 2.0)
 
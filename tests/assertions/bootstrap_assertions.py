@@ -65,3 +65,15 @@ def bootstrap_assertions(test_case: unittest.TestCase, module: Any) -> None:
         module.repetitions,
         "The first dimension of 'boot_results_sum_timeconst' does not match 'repetitions'",
     )
+
+    # The structure function bands share one grid and enclose the median
+    test_case.assertEqual(
+        module.boot_struc_cap_av.shape,
+        module.boot_struc_res_fine.shape,
+        "'boot_struc_cap_av' does not match the resistance grid",
+    )
+    test_case.assertTrue(
+        np.all(module.boot_struc_cap_perc_u <= module.boot_struc_cap_av)
+        and np.all(module.boot_struc_cap_av <= module.boot_struc_cap_perc_l),
+        "The median structure function is not enclosed by its percentiles",
+    )
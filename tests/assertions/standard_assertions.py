@@ -50,6 +50,23 @@ def standard_assertions(test_case: unittest.TestCase, module: Any) -> None:
             "Cauer capacitances contain non-finite values",
         )
 
+        if not getattr(module, "keep_mpfr_intermediates", True):
+            test_case.assertFalse(
+                hasattr(module, "mpfr_z_num"),
+                "Multiprecision intermediates were not released",
+            )
+
+        if getattr(module, "struc_resample_points", None) is not None:
+            test_case.assertEqual(
+                len(module.resampled_int_cau_res),
+                module.struc_resample_points,
+                "Resampled structure function has the wrong length",
+            )
+            test_case.assertTrue(
+                np.all(np.isfinite(module.resampled_diff_struc)),
+                "Resampled differential structure function contains non-finite values",
+            )
+
     # Data validation
     test_case.assertTrue(len(module.time) > 0, "Time array is empty")
     test_case.assertTrue(len(module.impedance) > 0, "Impedance array is empty")
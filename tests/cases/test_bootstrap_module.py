@@ -27,6 +27,67 @@ test_cases_bootstrap = [
             "theo_capacitances": [1e-4, 1e-1, 1e-4, 1e-3, 1e0],
         },
     },
+    {
+        "name": "bootstrap_evaluation_checkpoint",
+        "params": {
+            "output_dir": "tests/output/bootstrap_test",
+            "label": "bootstrap_evaluation_checkpoint",
+            "repetitions": 4,
+            "deconv_mode": "bayesian",
+            "bay_steps": 100,
+            "bootstrap_mode": "from_theo",
+            "evaluation_type": "bootstrap_standard",
+            "signal_to_noise_ratio": 50,
+            "random_seed": 3,
+            "checkpoint_file": "tests/output/bootstrap_test/bootstrap_checkpoint.pkl",
+            "checkpoint_interval": 0.0,
+            "theo_time": [4e-8, 500],
+            "theo_time_size": 10000,
+            "theo_delta": 2 * (2 * np.pi / 360),
+            "theo_resistances": [10, 10, 10, 10, 10],
+            "theo_capacitances": [1e-4, 1e-1, 1e-4, 1e-3, 1e0],
+        },
+    },
+    {
+        "name": "bootstrap_evaluation_parallel",
+        "params": {
+            "output_dir": "tests/output/bootstrap_test",
+            "label": "bootstrap_evaluation_parallel",
+            "repetitions": 6,
+            "deconv_mode": "bayesian",
+            "bay_steps": 100,
+            "bootstrap_mode": "from_theo",
+            "evaluation_type": "bootstrap_standard",
+            "signal_to_noise_ratio": 50,
+            "random_seed": 5,
+            "n_workers": 2,
+            "theo_time": [4e-8, 500],
+            "theo_time_size": 10000,
+            "theo_delta": 2 * (2 * np.pi / 360),
+            "theo_resistances": [10, 10, 10, 10, 10],
+            "theo_capacitances": [1e-4, 1e-1, 1e-4, 1e-3, 1e0],
+        },
+    },
+    {
+        "name": "bootstrap_evaluation_parallel_normalized",
+        "params": {
+            "data": MOSFET_DRY_DATA,
+            "output_dir": "tests/output/bootstrap_test",
+            "label": "bootstrap_evaluation_parallel_normalized",
+            "repetitions": 3,
+            "deconv_mode": "bayesian",
+            "bay_steps": 1000,
+            "bootstrap_mode": "from_data",
+            "evaluation_type": "bootstrap_standard",
+            "input_mode": "volt",
+            "calib": MOSFET_CALIB_DATA,
+            "lower_fit_limit": 5e-4,
+            "upper_fit_limit": 1e-3,
+            "random_seed": 1,
+            "n_workers": 2,
+            "normalize_impedance_to_previous": True,
+        },
+    },
     {
         "name": "bootstrap_evaluation_from_data",
         "params": {
@@ -58,3 +119,101 @@ class TestBootstrapModule(TransientTestBase):
             evaluation_module="bootstrap_module",
             additional_assertions=bootstrap_assertions,
         )
+
+    def test_bootstrap_resume(self):
+        from unittest import mock
+        from PyRth import Evaluation
+
+        params = next(
+            case["params"]
+            for case in test_cases_bootstrap
+            if case["name"] == "bootstrap_evaluation_checkpoint"
+        )
+        module = Evaluation().bootstrap_module(params.copy())
+
+        # interrupt a second run after two of the four repetitions
+        repetition = Evaluation._bootstrap_repetition
+        completed = []
+
+        def interrupted_repetition(evaluation, noise, repetition_seed):
+            if len(completed) == 2:
+                raise RuntimeError("interrupted")
+            completed.append(repetition_seed)
+            return repetition(evaluation, noise, repetition_seed)
+
+        with mock.patch.object(
+            Evaluation, "_bootstrap_repetition", interrupted_repetition
+        ):
+            with self.assertRaises(RuntimeError):
+                Evaluation().bootstrap_module(params.copy())
+
+        # resuming runs the remaining repetitions on their own streams
+        resumed = Evaluation().resume(params["checkpoint_file"])
+
+        np.testing.assert_array_equal(resumed.boot_results_imp, module.boot_results_imp)
+        np.testing.assert_array_equal(
+            resumed.boot_struc_res_fine, module.boot_struc_res_fine
+        )
+        np.testing.assert_array_equal(
+            resumed.boot_struc_cap_av, module.boot_struc_cap_av
+        )
+
+    @parameterized.expand(
+        [
+            ("bootstrap_evaluation_parallel",),
+            ("bootstrap_evaluation_parallel_normalized",),
+        ]
+    )
+    def test_bootstrap_parallel_reproducible(self, name: str):
+        from PyRth import Evaluation
+
+        params = next(
+            case["params"] for case in test_cases_bootstrap if case["name"] == name
+        )
+        parallel = Evaluation().bootstrap_module(params.copy())
+        serial = Evaluation().bootstrap_module({**params, "n_workers": 1})
+
+        # the repetitions draw from spawned streams, so the worker count does not matter
+        np.testing.assert_array_equal(
+            parallel.boot_results_imp, serial.boot_results_imp
+        )
+        np.testing.assert_array_equal(
+            parallel.boot_struc_cap_av, serial.boot_struc_cap_av
+        )
+
+    def test_structure_function_bands(self):
+        import scipy.interpolate as ipl
+        from PyRth.utils import transient_utils as utl
+
+        rng = np.random.default_rng(0)
+        struc_res = [
+            np.cumsum(rng.uniform(0.01, 0.2, 40)) + rng.uniform(0.0, 0.3)
+            for _ in range(12)
+        ]
+        struc_cap = [
+            np.cumsum(np.exp(np.linspace(-6.0, 2.0, 40))) * rng.uniform(0.8, 1.2)
+            for _ in range(12)
+        ]
+        # a repetition whose resistances are not monotonic in the middle
+        struc_res[3][[10, 11]] = struc_res[3][[11, 10]]
+
+        grid, median, lower, upper = utl.structure_function_bands(
+            struc_res, struc_cap, [10, 90]
+        )
+
+        # per point loop over the repetitions, as the bootstrap computed the bands before
+        interp_func = [
+            ipl.interp1d(res, cap, assume_sorted=False)
+            for res, cap in zip(struc_res, struc_cap)
+        ]
+        for n, res in enumerate(grid):
+            vals = []
+            for m in range(len(struc_res)):
+                if res > struc_res[m][-1]:
+                    vals.append(struc_cap[m][-1])
+                elif struc_res[m][0] <= res <= struc_res[m][-1]:
+                    vals.append(interp_func[m](res))
+            self.assertAlmostEqual(median[n], np.median(vals), places=10)
+            reference = np.percentile(vals, [10, 90])
+            self.assertAlmostEqual(lower[n], reference[0], places=10)
+            self.assertAlmostEqual(upper[n], reference[1], places=10)
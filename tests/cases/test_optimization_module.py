@@ -1,3 +1,4 @@
+import os
 import numpy as np
 from tests.data.measurement_data import (
     MOSFET_DRY_DATA,
@@ -55,6 +56,119 @@ test_cases_optimization = [
             ),  # angle to rotate Z(s) into the complex plane to avoid singularities (smaller is better, but makes peaks sharper)
         },
     },
+    {
+        "name": "optimization_case_slsqp",
+        "params": {
+            "data": MOSFET_TIM_DATA,
+            "output_dir": "tests/output/optimization_test",
+            "label": "optimization_case_slsqp",
+            "input_mode": "volt",
+            "opt_model_layers": 10,
+            "opt_method": "SLSQP",
+            "calib": MOSFET_CALIB_DATA,
+            "lower_fit_limit": 5e-4,
+            "upper_fit_limit": 1e-3,
+            "theo_time": [1e-8, 5e2],
+            "theo_time_size": 3000,
+            "theo_delta": 2.0 * (2 * np.pi / 360),
+        },
+    },
+    {
+        "name": "optimization_case_multi_start",
+        "params": {
+            "data": MOSFET_TIM_DATA,
+            "output_dir": "tests/output/optimization_test",
+            "label": "optimization_case_multi_start",
+            "input_mode": "volt",
+            "opt_model_layers": 10,
+            "opt_method": "SLSQP",
+            "opt_multi_start": 3,
+            "opt_multi_start_agree": 2,
+            "n_workers": 2,
+            "random_seed": 0,
+            "calib": MOSFET_CALIB_DATA,
+            "lower_fit_limit": 5e-4,
+            "upper_fit_limit": 1e-3,
+            "theo_time": [1e-8, 5e2],
+            "theo_time_size": 3000,
+            "theo_delta": 2.0 * (2 * np.pi / 360),
+        },
+    },
+    {
+        "name": "optimization_case_differential_evolution",
+        "params": {
+            "data": MOSFET_TIM_DATA,
+            "output_dir": "tests/output/optimization_test",
+            "label": "optimization_case_differential_evolution",
+            "input_mode": "volt",
+            "opt_model_layers": 10,
+            "opt_method": "differential_evolution",
+            "opt_population_size": 3,
+            "opt_max_generations": 20,
+            "random_seed": 0,
+            "calib": MOSFET_CALIB_DATA,
+            "lower_fit_limit": 5e-4,
+            "upper_fit_limit": 1e-3,
+            "theo_time": [1e-8, 5e2],
+            "theo_time_size": 1000,
+            "theo_delta": 2.0 * (2 * np.pi / 360),
+        },
+    },
+    {
+        "name": "optimization_case_reduced_grid",
+        "params": {
+            "data": MOSFET_TIM_DATA,
+            "output_dir": "tests/output/optimization_test",
+            "label": "optimization_case_reduced_grid",
+            "input_mode": "volt",
+            "opt_model_layers": 10,
+            "opt_method": "SLSQP",
+            "opt_reduced_grid": True,
+            "calib": MOSFET_CALIB_DATA,
+            "lower_fit_limit": 5e-4,
+            "upper_fit_limit": 1e-3,
+            "theo_time": [1e-8, 5e2],
+            "theo_delta": 2.0 * (2 * np.pi / 360),
+        },
+    },
+    {
+        "name": "optimization_case_fidelity_stages",
+        "params": {
+            "data": MOSFET_TIM_DATA,
+            "output_dir": "tests/output/optimization_test",
+            "label": "optimization_case_fidelity_stages",
+            "input_mode": "volt",
+            "opt_model_layers": 10,
+            "opt_method": "SLSQP",
+            "opt_fidelity_stages": 3,
+            "opt_reduced_grid": True,
+            "calib": MOSFET_CALIB_DATA,
+            "lower_fit_limit": 5e-4,
+            "upper_fit_limit": 1e-3,
+            "theo_time": [1e-8, 5e2],
+            "theo_time_size": 3000,
+            "theo_delta": 2.0 * (2 * np.pi / 360),
+        },
+    },
+    {
+        "name": "optimization_case_poles",
+        "params": {
+            "data": MOSFET_TIM_DATA,
+            "output_dir": "tests/output/optimization_test",
+            "label": "optimization_case_poles",
+            "input_mode": "volt",
+            "opt_model_layers": 10,
+            "opt_method": "SLSQP",
+            "forward_model": "poles",
+            "pole_cells": 8,
+            "calib": MOSFET_CALIB_DATA,
+            "lower_fit_limit": 5e-4,
+            "upper_fit_limit": 1e-3,
+            "theo_time": [1e-8, 5e2],
+            "theo_time_size": 3000,
+            "theo_delta": 2.0 * (2 * np.pi / 360),
+        },
+    },
 ]
 
 
@@ -69,3 +183,134 @@ class TestOptimizationModule(TransientTestBase):
             evaluation_module="optimization_module",
             additional_assertions=optimization_assertions,
         )
+
+    def test_optimization_library_init(self):
+        from PyRth import Evaluation, StructureLibrary
+
+        params = {
+            **next(
+                case["params"]
+                for case in test_cases_optimization
+                if case["name"] == "optimization_case_slsqp"
+            ),
+            "theo_time_size": 1000,
+        }
+        module = Evaluation().optimization_module(params)
+
+        library = StructureLibrary(module.theo_log_time)
+        library.add_module(module)
+        res = np.diff(module.fin_res, prepend=0)
+        cap = np.diff(module.fin_cap, prepend=0)
+        library.add_theoretical(
+            [res * 2, res / 2],
+            [cap / 2, cap * 2],
+            theo_time=params["theo_time"],
+            theo_time_size=params["theo_time_size"],
+            theo_delta=params["theo_delta"],
+        )
+        path = "tests/output/optimization_test/structure_library.npz"
+        library.save(path)
+
+        # the library is searched for the network of the first evaluation
+        lib_module = Evaluation().optimization_module(
+            {
+                **params,
+                "label": "optimization_case_library",
+                "struc_init_method": "library",
+                "struc_library": path,
+            }
+        )
+
+        np.testing.assert_allclose(lib_module.init_opt_imp_res, module.fin_res)
+        np.testing.assert_allclose(lib_module.init_opt_imp_cap, module.fin_cap)
+        optimization_assertions(self, lib_module)
+
+    def test_multi_start_checkpoint_and_order(self):
+        from PyRth import Evaluation
+        from PyRth.utils import transient_utils as utl
+
+        params = next(
+            case["params"]
+            for case in test_cases_optimization
+            if case["name"] == "optimization_case_multi_start"
+        )
+        checkpoint_file = "tests/output/optimization_test/multi_start_checkpoint.pkl"
+        if os.path.exists(checkpoint_file):
+            os.remove(checkpoint_file)
+
+        serial = Evaluation().optimization_module(
+            {
+                **params,
+                "label": "optimization_case_multi_start_serial",
+                "n_workers": 1,
+                "checkpoint_file": checkpoint_file,
+                "checkpoint_interval": 0.0,
+            }
+        )
+        parallel = Evaluation().optimization_module(params)
+
+        # the checkpoint holds the best network over all starts
+        state = utl.load_checkpoint(checkpoint_file)
+        self.assertAlmostEqual(
+            state["objective"], np.min(serial.multi_start_objectives), places=8
+        )
+
+        # the starts are evaluated in start order whatever the worker count
+        np.testing.assert_allclose(
+            parallel.multi_start_objectives, serial.multi_start_objectives, rtol=1e-6
+        )
+
+    @parameterized.expand([("transmission_line",), ("poles",)])
+    def test_structure_library_nearest(self, forward_model: str):
+        from PyRth import StructureLibrary
+        from PyRth import transient_optimizer as trop
+
+        theo_time = [1e-6, 1e2]
+        theo_time_size = 2000
+        theo_delta = 2.0 * (2 * np.pi / 360)
+        log_time = np.linspace(np.log(theo_time[0]), np.log(theo_time[1]), 500)
+        res = np.array([1.0, 2.0, 4.0])
+        cap = np.array([1e-4, 1e-2, 1e0])
+
+        library = StructureLibrary(log_time)
+        library.add_theoretical(
+            [res * scale for scale in [0.5, 0.9, 1.5]],
+            [cap] * 3,
+            labels=["half", "close", "far"],
+            theo_time=theo_time,
+            theo_time_size=theo_time_size,
+            theo_delta=theo_delta,
+            forward_model=forward_model,
+            pole_cells=8,
+        )
+
+        # the query network itself is not in the library
+        optimizer = trop.TransientOptimizer(
+            {"forward_model": forward_model, "pole_cells": 8}
+        )
+        theo_log_time = np.linspace(
+            np.log(theo_time[0]), np.log(theo_time[1]), theo_time_size
+        )
+        _, _, impedance = optimizer.network_response(
+            theo_log_time, theo_delta, res, cap
+        )
+        index, distance = library.nearest(theo_log_time, impedance, k=2)
+
+        self.assertEqual([library.labels[n] for n in index], ["close", "far"])
+        self.assertGreater(distance[0], 0.0)
+        self.assertLess(distance[0], distance[1])
+
+    @parameterized.expand([(1,), (2,), (4,)])
+    def test_optimal_fit_layers(self, N: int):
+        from PyRth import transient_optimizer as trop
+
+        res_l = np.linspace(0.01, 10.0, 500)
+        cap_l = np.exp(0.8 * res_l - 9.0)
+        (opt_res, opt_cap, r_init, c_init), _ = (
+            trop.TransientOptimizer().optimize_theo_struc(res_l, cap_l, N)
+        )
+
+        # one knot per layer, the last one at the end of the structure function
+        for values in (opt_res, opt_cap, r_init, c_init):
+            self.assertEqual(len(values), N)
+        self.assertEqual(opt_res[-1], res_l[-1])
@@ -213,6 +213,102 @@ test_cases_basic = [
             "upper_fit_limit": 1e-3,
         },
     },
+    {
+        "name": "MOSFET_tim_basic_rkpw",
+        "params": {
+            "data": MOSFET_TIM_DATA,
+            "output_dir": "tests/output/basic_test",
+            "label": "MOSFET_tim_basic_rkpw",
+            "input_mode": "volt",
+            "deconv_mode": "bayesian",
+            "bay_steps": 1000,
+            "struc_method": "rkpw",
+            "calib": MOSFET_CALIB_DATA,
+            "lower_fit_limit": 5e-4,
+            "upper_fit_limit": 1e-3,
+        },
+    },
+    {
+        "name": "MOSFET_tim_reduced_sobhy",
+        "params": {
+            "data": MOSFET_TIM_DATA,
+            "output_dir": "tests/output/basic_test",
+            "label": "MOSFET_tim_reduced_sobhy",
+            "input_mode": "volt",
+            "deconv_mode": "bayesian",
+            "bay_steps": 1000,
+            "struc_method": "sobhy",
+            "foster_reduction_tol": 1e-3,
+            "calib": MOSFET_CALIB_DATA,
+            "lower_fit_limit": 5e-4,
+            "upper_fit_limit": 1e-3,
+        },
+    },
+    {
+        "name": "MOSFET_tim_polylong_max_resistance",
+        "params": {
+            "data": MOSFET_TIM_DATA,
+            "output_dir": "tests/output/basic_test",
+            "label": "MOSFET_tim_polylong_max_resistance",
+            "input_mode": "volt",
+            "deconv_mode": "bayesian",
+            "bay_steps": 1000,
+            "struc_method": "polylong",
+            "struc_max_resistance": 3.0,
+            "calib": MOSFET_CALIB_DATA,
+            "lower_fit_limit": 5e-4,
+            "upper_fit_limit": 1e-3,
+        },
+    },
+    {
+        "name": "MOSFET_tim_resampled_struc",
+        "params": {
+            "data": MOSFET_TIM_DATA,
+            "output_dir": "tests/output/basic_test",
+            "label": "MOSFET_tim_resampled_struc",
+            "input_mode": "volt",
+            "deconv_mode": "bayesian",
+            "bay_steps": 1000,
+            "struc_method": "sobhy",
+            "struc_resample_points": 1000,
+            "calib": MOSFET_CALIB_DATA,
+            "lower_fit_limit": 5e-4,
+            "upper_fit_limit": 1e-3,
+        },
+    },
+    {
+        "name": "MOSFET_tim_multi_method",
+        "params": {
+            "data": MOSFET_TIM_DATA,
+            "output_dir": "tests/output/basic_test",
+            "label": "MOSFET_tim_multi_method",
+            "input_mode": "volt",
+            "deconv_mode": "bayesian",
+            "bay_steps": 1000,
+            "struc_method": ["polylong", "sobhy", "rkpw"],
+            "n_workers": 2,
+            "calib": MOSFET_CALIB_DATA,
+            "lower_fit_limit": 5e-4,
+            "upper_fit_limit": 1e-3,
+        },
+    },
+    {
+        "name": "MOSFET_tim_multi_method_threads",
+        "params": {
+            "data": MOSFET_TIM_DATA,
+            "output_dir": "tests/output/basic_test",
+            "label": "MOSFET_tim_multi_method_threads",
+            "input_mode": "volt",
+            "deconv_mode": "bayesian",
+            "bay_steps": 1000,
+            "struc_method": ["sobhy", "rkpw"],
+            "n_workers": 2,
+            "parallel_backend": "thread",
+            "calib": MOSFET_CALIB_DATA,
+            "lower_fit_limit": 5e-4,
+            "upper_fit_limit": 1e-3,
+        },
+    },
     {
         "name": "temp_transient",
         "params": {
@@ -267,3 +363,20 @@ class TestStandardModule(TransientTestBase):
             evaluation_module="standard_module",
             additional_assertions=standard_assertions,
         )
+
+    def test_resample_structure_function(self):
+        from PyRth.utils import transient_utils as utl
+
+        int_cau_res = np.cumsum([0.5, 1.0, 2.0, 1.5])
+        int_cau_cap = np.cumsum([1e-4, 1e-3, 1e-2, 1e-1])
+        grid_res, grid_cap, _ = utl.resample_structure_function(
+            int_cau_res, int_cau_cap, 11
+        )
+        np.testing.assert_allclose(grid_res[[0, -1]], int_cau_res[[0, -1]])
+        np.testing.assert_allclose(grid_cap[[0, -1]], int_cau_cap[[0, -1]])
+
+        # a negative Cauer resistance makes the resampling ambiguous
+        with self.assertRaises(ValueError):
+            utl.resample_structure_function(
+                np.cumsum([0.5, 1.0, -0.2, 1.5]), int_cau_cap, 11
+            )
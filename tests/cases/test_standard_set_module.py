@@ -105,6 +105,29 @@ test_cases_set = [
             "theo_delta": 1.5 * (2 * np.pi / 360),
         },
     },
+    {
+        "name": "optimization_evaluation_set_layers_warm_start",
+        "params": {
+            "data": MOSFET_DRY_DATA,
+            "output_dir": "tests/output/set_test",
+            "label": "optimization_evaluation_set_layers_warm_start",
+            "input_mode": "volt",
+            "iterable_keywords": ["opt_model_layers"],
+            "opt_model_layers": [7, 8, 9],
+            "opt_warm_start": True,
+            "evaluation_type": "optimization",
+            "calib": MOSFET_CALIB_DATA,
+            "lower_fit_limit": 5e-4,
+            "upper_fit_limit": 1e-3,
+            "opt_method": "SLSQP",
+            "theo_time": [
+                1e-8,
+                5e2,
+            ],
+            "theo_time_size": 7500,
+            "theo_delta": 1.5 * (2 * np.pi / 360),
+        },
+    },
     {
         "name": "standard_evaluation_set_gen_steps",
         "params": {
@@ -120,6 +143,22 @@ test_cases_set = [
             "upper_fit_limit": 1e-3,
         },
     },
+    {
+        "name": "standard_evaluation_set_parallel",
+        "params": {
+            "data": MOSFET_DRY_DATA,
+            "output_dir": "tests/output/set_test",
+            "label": "standard_evaluation_set_parallel",
+            "input_mode": "volt",
+            "iterable_keywords": ["bay_steps"],
+            "bay_steps": [1000, 2000, 3000],
+            "evaluation_type": "standard",
+            "calib": MOSFET_CALIB_DATA,
+            "lower_fit_limit": 5e-4,
+            "upper_fit_limit": 1e-3,
+            "n_workers": 2,
+        },
+    },
     {
         "name": "standard_evaluation_set_gen_size",
         "params": {
@@ -232,3 +271,25 @@ class TestStandardModuleSet(TransientTestBase):
             evaluation_module="standard_module_set",
             additional_assertions=standard_set_assertions,
         )
+
+    def test_parallel_set_matches_serial(self):
+        from PyRth import Evaluation
+
+        params = next(
+            case["params"]
+            for case in self.test_cases
+            if case["name"] == "standard_evaluation_set_parallel"
+        )
+
+        parallel_modules = Evaluation().standard_module_set(params.copy())
+        serial_modules = Evaluation().standard_module_set(
+            {**params, "n_workers": 1}
+        )
+
+        self.assertEqual(
+            [module.label for module in parallel_modules],
+            [module.label for module in serial_modules],
+        )
+        for parallel, serial in zip(parallel_modules, serial_modules):
+            np.testing.assert_allclose(parallel.int_cau_res, serial.int_cau_res)
+            np.testing.assert_allclose(parallel.int_cau_cap, serial.int_cau_cap)
@@ -52,6 +52,31 @@ test_cases_theoretical = [
             "theo_capacitances": [1e-9, 2e-8, 1e-7, 2e-9, 1e-5],
         },
     },
+    {
+        "name": "theoretical_case_short_grid",
+        "params": {
+            "output_dir": "tests/output/theoretical_test",
+            "label": "theoretical_case_short_grid",
+            "theo_time": [1e-3, 1e-1],
+            "theo_time_size": 2000,
+            "theo_delta": 1.5 * (2 * np.pi / 360),
+            "theo_resistances": [5, 15, 10],
+            "theo_capacitances": [1e-5, 1e-3, 1e-4],
+        },
+    },
+    {
+        "name": "theoretical_case_poles",
+        "params": {
+            "output_dir": "tests/output/theoretical_test",
+            "label": "theoretical_case_poles",
+            "theo_time": [5e-9, 20],
+            "theo_time_size": 10000,
+            "theo_delta": 1.5 * (2 * np.pi / 360),
+            "theo_resistances": [5, 15, 10, 10, 10],
+            "theo_capacitances": [1e-5, 1e-3, 1e-4, 1e-2, 1e-1],
+            "forward_model": "poles",
+        },
+    },
 ]
 
 
@@ -66,3 +91,23 @@ class TestTheoreticalModule(TransientTestBase):
             evaluation_module="theoretical_module",
             additional_assertions=theoretical_assertions,
         )
+
+    def test_poles_forward_model(self):
+        from PyRth import Evaluation
+
+        params = next(
+            case["params"]
+            for case in test_cases_theoretical
+            if case["name"] == "theoretical_case_poles"
+        )
+        poles = Evaluation().theoretical_module(params)
+        line = Evaluation().theoretical_module(
+            {**params, "forward_model": "transmission_line"}
+        )
+
+        # the sum of the Foster resistances is the total resistance of the sections
+        total = sum(params["theo_resistances"])
+        self.assertAlmostEqual(poles.theo_impedance[-1], total, places=8)
+        np.testing.assert_allclose(
+            poles.theo_impedance, line.theo_impedance, rtol=0, atol=0.02 * total
+        )